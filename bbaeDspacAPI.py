@@ -0,0 +1,414 @@
+# Shared engine for BBAE and dSPAC
+# Both APIs come from the same platform and only differ in client class
+
+import asyncio
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from dotenv import load_dotenv
+
+from helperAPI import (
+    Brokerage,
+    getOTPCodeDiscord,
+    getUserInputDiscord,
+    maskString,
+    printAndDiscord,
+    printHoldings,
+    send_captcha_to_discord,
+    stockOrder,
+)
+
+
+def engine_init(broker_name: str, client_class, EXTERNAL=None, botObj=None, loop=None):
+    """
+    Logs in to every account for a BBAE-style broker.
+
+    Args:
+        broker_name (str): Display and .env name of the broker, e.g. "BBAE" or "DSPAC".
+        client_class: API client class to use, e.g. BBAEAPI or DSPACAPI.
+        EXTERNAL (str): Credentials to use instead of the .env variable.
+        botObj (Bot): The discord bot object if used.
+        loop (AbstractEventLoop): The event loop to be used
+    Returns:
+        Brokerage object holding the logged in clients, or None if not configured.
+    """
+    load_dotenv()
+    broker_obj = Brokerage(broker_name)
+    if not os.getenv(broker_name) and EXTERNAL is None:
+        print(f"{broker_name} not found, skipping...")
+        return None
+    accounts = (
+        os.environ[broker_name].strip().split(",")
+        if EXTERNAL is None
+        else EXTERNAL.strip().split(",")
+    )
+    print(f"Logging in to {broker_name}...")
+    for index, account in enumerate(accounts):
+        name = f"{broker_name} {index + 1}"
+        try:
+            user, password = account.split(":")[:2]
+            use_email = "@" in user
+            # Initialize the API object
+            client = client_class(
+                user,
+                password,
+                filename=f"{broker_name}_{index + 1}.pkl",
+                creds_path="./creds/",
+            )
+            client.make_initial_request()
+            # All the rest of the requests responsible for getting authenticated
+            login(client, botObj, name, loop, use_email)
+            account_assets = client.get_account_assets()
+            account_info = client.get_account_info()
+            account_number = str(account_info["Data"]["accountNumber"])
+            # Set account values
+            masked_account_number = maskString(account_number)
+            broker_obj.set_account_number(name, masked_account_number)
+            broker_obj.set_account_totals(
+                name,
+                masked_account_number,
+                float(account_assets["Data"]["totalAssets"]),
+            )
+            broker_obj.set_logged_in_object(name, client, "client")
+        except Exception as e:
+            print(f"Error logging into {broker_name}: {e}")
+            print(traceback.format_exc())
+            continue
+    print(f"Logged into {broker_name}!")
+    return broker_obj
+
+
+def login(client, botObj, name, loop, use_email):
+    try:
+        # API call to generate the login ticket
+        if use_email:
+            ticket_response = client.generate_login_ticket_email()
+        else:
+            ticket_response = client.generate_login_ticket_sms()
+        # Ensure "Data" key exists and proceed with verification if necessary
+        if ticket_response.get("Data") is None:
+            raise Exception("Invalid response from generating login ticket")
+        # Check if SMS or CAPTCHA verification are required
+        data = ticket_response["Data"]
+        if data.get("needSmsVerifyCode", False):
+            sms_and_captcha_response = handle_captcha_and_sms(
+                client, botObj, data, loop, name, use_email
+            )
+            if not sms_and_captcha_response:
+                raise Exception("Error solving SMS or Captcha")
+            # Get the OTP code from the user
+            if botObj is not None and loop is not None:
+                otp_code = asyncio.run_coroutine_threadsafe(
+                    getOTPCodeDiscord(botObj, name, timeout=300, loop=loop),
+                    loop,
+                ).result()
+            else:
+                otp_code = input("Enter security code: ")
+            if otp_code is None:
+                raise Exception("No OTP code received")
+            # Login with the OTP code
+            if use_email:
+                ticket_response = client.generate_login_ticket_email(sms_code=otp_code)
+            else:
+                ticket_response = client.generate_login_ticket_sms(sms_code=otp_code)
+            if ticket_response.get("Message") == "Incorrect verification code.":
+                raise Exception("Incorrect OTP code")
+        # Handle the login ticket
+        if (
+            ticket_response.get("Data") is not None
+            and ticket_response["Data"].get("ticket") is not None
+        ):
+            ticket = ticket_response["Data"]["ticket"]
+        else:
+            print(f"{name}: Raw response object: {ticket_response}")
+            raise Exception(
+                f"Login failed. No ticket generated. Response: {ticket_response}"
+            )
+        # Login with the ticket
+        login_response = client.login_with_ticket(ticket)
+        if login_response.get("Outcome") != "Success":
+            raise Exception(f"Login failed. Response: {login_response}")
+        return True
+    except Exception as e:
+        print(f"Error in OTP login: {e}")
+        print(traceback.format_exc())
+        return False
+
+
+def handle_captcha_and_sms(client, botObj, data, loop, name, use_email):
+    try:
+        # If CAPTCHA is needed it will generate an SMS code as well
+        if data.get("needCaptchaCode", False):
+            print(f"{name}: CAPTCHA required. Requesting CAPTCHA image...")
+            sms_response = solve_captcha(client, botObj, name, loop, use_email)
+            if not sms_response:
+                raise Exception("Failure solving CAPTCHA!")
+            print(f"{name}: CAPTCHA solved. SMS response is: {sms_response}")
+        else:
+            print(f"{name}: Requesting code...")
+            sms_response = send_sms_code(client, name, use_email)
+            if not sms_response:
+                raise Exception("Unable to retrieve sms code!")
+            print(f"{name}: SMS response is: {sms_response}")
+        return True
+    except Exception as e:
+        print(f"Error in CAPTCHA or SMS: {e}")
+        print(traceback.format_exc())
+        return False
+
+
+def solve_captcha(client, botObj, name, loop, use_email):
+    try:
+        captcha_image = client.request_captcha()
+        if not captcha_image:
+            raise Exception("Unable to request CAPTCHA image, aborting...")
+        # Send the CAPTCHA image to Discord for manual input
+        print("Sending CAPTCHA to Discord for user input...")
+        file = BytesIO()
+        captcha_image.save(file, format="PNG")
+        file.seek(0)
+        # Retrieve input
+        if botObj is not None and loop is not None:
+            asyncio.run_coroutine_threadsafe(
+                send_captcha_to_discord(file),
+                loop,
+            ).result()
+            captcha_input = asyncio.run_coroutine_threadsafe(
+                getUserInputDiscord(
+                    botObj, f"{name} requires CAPTCHA input", timeout=300, loop=loop
+                ),
+                loop,
+            ).result()
+        else:
+            captcha_image.save("./captcha.png", format="PNG")
+            captcha_input = input(
+                "CAPTCHA image saved to ./captcha.png. Please open it and type in the code: "
+            )
+        if captcha_input is None:
+            raise Exception("No CAPTCHA code found")
+        # Send the CAPTCHA to the appropriate API based on login type
+        if use_email:
+            sms_request_response = client.request_email_code(
+                captcha_input=captcha_input
+            )
+        else:
+            sms_request_response = client.request_sms_code(captcha_input=captcha_input)
+        if sms_request_response.get("Message") == "Incorrect verification code.":
+            raise Exception("Incorrect CAPTCHA code!")
+        return sms_request_response
+    except Exception as e:
+        print(f"{name}: Error solving CAPTCHA code: {e}")
+        print(traceback.format_exc())
+        return None
+
+
+def send_sms_code(client, name, use_email, captcha_input=None):
+    if use_email:
+        sms_code_response = client.request_email_code(captcha_input=captcha_input)
+    else:
+        sms_code_response = client.request_sms_code(captcha_input=captcha_input)
+    if sms_code_response.get("Message") == "Incorrect verification code.":
+        print(f"{name}: Incorrect CAPTCHA code, retrying...")
+        return False
+    return sms_code_response
+
+
+def engine_account_holdings(broker_obj: Brokerage, key: str, account: str):
+    obj = broker_obj.get_logged_in_objects(key, "client")
+    try:
+        positions = obj.get_account_holdings()
+        if positions.get("Data") is not None:
+            for holding in positions["Data"]:
+                qty = holding["CurrentAmount"]
+                if float(qty) == 0:
+                    continue
+                sym = holding["displaySymbol"]
+                cp = holding["Last"]
+                broker_obj.set_holdings(key, account, sym, qty, cp)
+    except Exception as e:
+        printAndDiscord(f"Error getting {broker_obj.get_name()} holdings: {e}")
+        print(traceback.format_exc())
+
+
+def engine_holdings(broker_obj: Brokerage, loop=None):
+    # Every login is a separate session, so get them all at once
+    with ThreadPoolExecutor() as executor:
+        for key in broker_obj.get_account_numbers():
+            for account in broker_obj.get_account_numbers(key):
+                executor.submit(engine_account_holdings, broker_obj, key, account)
+    printHoldings(broker_obj, loop, False)
+
+
+def engine_positions(broker_obj: Brokerage, key: str) -> dict:
+    # Snapshot of sellable shares per symbol for one login
+    obj = broker_obj.get_logged_in_objects(key, "client")
+    positions = obj.get_account_holdings()
+    if positions.get("Data") is None:
+        raise Exception(f"No positions data: {positions}")
+    snapshot = {}
+    for holding in positions["Data"]:
+        available = holding.get("enableAmount", holding.get("EnableAmount"))
+        if available is None:
+            available = holding["CurrentAmount"]
+        snapshot[holding["displaySymbol"].upper()] = float(available)
+    return snapshot
+
+
+def engine_validate(
+    broker_obj: Brokerage,
+    key: str,
+    account: str,
+    s: str,
+    orderObj: stockOrder,
+    positions: dict = None,
+):
+    # Validate one account leg, returns the validation response if it
+    # can be executed, otherwise the failure message
+    obj = broker_obj.get_logged_in_objects(key, "client")
+    action = orderObj.get_action().lower()
+    quantity = orderObj.get_amount()
+    # Buy
+    if action == "buy":
+        validation_response = obj.validate_buy(
+            symbol=s,
+            amount=quantity,
+            order_side=1,
+            account_number=account,
+        )
+        if validation_response["Outcome"] != "Success":
+            return False, (
+                f"{key} {account}: Validation failed for buying {quantity} of {s}: {validation_response['Message']}"
+            )
+        return True, validation_response
+    # Sell
+    if positions is not None:
+        # Use the positions snapshot from the start of the order
+        available_amount = positions.get(s, 0)
+    else:
+        # Check stock holdings before attempting to sell
+        holdings_response = obj.check_stock_holdings(symbol=s, account_number=account)
+        if holdings_response["Outcome"] != "Success":
+            return False, (
+                f"{key} {account}: Error checking holdings: {holdings_response['Message']}"
+            )
+        available_amount = float(holdings_response["Data"]["enableAmount"])
+    # If trying to sell more than available, skip to the next
+    if quantity > available_amount:
+        return False, (
+            f"{key} {account}: Not enough shares to sell {quantity} of {s}. Available: {available_amount}"
+        )
+    validation_response = obj.validate_sell(
+        symbol=s, amount=quantity, account_number=account
+    )
+    if validation_response["Outcome"] != "Success":
+        return False, (
+            f"{key} {account}: Validation failed for selling {quantity} of {s}: {validation_response['Message']}"
+        )
+    return True, validation_response
+
+
+def engine_execute(
+    broker_obj: Brokerage,
+    key: str,
+    account: str,
+    s: str,
+    orderObj: stockOrder,
+    validation_response: dict,
+) -> str:
+    # Execute one validated account leg, returns the result message
+    obj = broker_obj.get_logged_in_objects(key, "client")
+    action = orderObj.get_action().lower()
+    quantity = orderObj.get_amount()
+    is_dry_run = orderObj.get_dry()
+    if is_dry_run:
+        message = "Dry Run Success"
+    elif action == "buy":
+        buy_response = obj.execute_buy(
+            symbol=s,
+            amount=quantity,
+            account_number=account,
+            dry_run=is_dry_run,
+        )
+        message = buy_response["Message"]
+    else:
+        entrust_price = validation_response["Data"]["entrustPrice"]
+        sell_response = obj.execute_sell(
+            symbol=s,
+            amount=quantity,
+            account_number=account,
+            entrust_price=entrust_price,
+            dry_run=is_dry_run,
+        )
+        message = sell_response["Message"]
+    return f"{key}: {action.capitalize()} {quantity} of {s} in {account}: {message}"
+
+
+def engine_transaction(broker_obj: Brokerage, orderObj: stockOrder, loop=None):
+    print()
+    print("==============================")
+    print(broker_obj.get_name())
+    print("==============================")
+    print()
+    # For sells, get every login's positions once instead of
+    # checking each account for each ticker
+    all_positions = {}
+    if orderObj.get_action().lower() == "sell":
+        with ThreadPoolExecutor() as executor:
+            snapshots = {
+                key: executor.submit(engine_positions, broker_obj, key)
+                for key in broker_obj.get_account_numbers()
+            }
+        for key, snapshot in snapshots.items():
+            try:
+                all_positions[key] = snapshot.result()
+            except Exception as e:
+                # Fall back to checking holdings per ticker
+                print(f"{key}: Error getting positions: {e}")
+    for s in orderObj.get_stocks():
+        legs = [
+            (key, account)
+            for key in broker_obj.get_account_numbers()
+            for account in broker_obj.get_account_numbers(key)
+        ]
+        for key in broker_obj.get_account_numbers():
+            printAndDiscord(
+                f"{key}: {orderObj.get_action().lower()}ing {orderObj.get_amount()} of {s}",
+                loop,
+            )
+        with ThreadPoolExecutor() as executor:
+            # Validate every leg at once
+            validations = {}
+            for key, account in legs:
+                positions = all_positions.get(key)
+                if positions is not None and s not in positions:
+                    printAndDiscord(
+                        f"{key} {account}: No shares of {s} to sell, skipping", loop
+                    )
+                    continue
+                validations[(key, account)] = executor.submit(
+                    engine_validate, broker_obj, key, account, s, orderObj, positions
+                )
+            executions = {}
+            for leg, validation in validations.items():
+                key, account = leg
+                try:
+                    valid, result = validation.result()
+                except Exception as e:
+                    printAndDiscord(f"{key} {account}: Error placing order: {e}", loop)
+                    print(traceback.format_exc())
+                    continue
+                if not valid:
+                    printAndDiscord(result, loop)
+                    continue
+                # Then execute every leg that validated at once
+                executions[leg] = executor.submit(
+                    engine_execute, broker_obj, key, account, s, orderObj, result
+                )
+            for (key, account), execution in executions.items():
+                try:
+                    printAndDiscord(execution.result(), loop)
+                except Exception as e:
+                    printAndDiscord(f"{key} {account}: Error placing order: {e}", loop)
+                    print(traceback.format_exc())
@@ -5,9 +5,11 @@ import asyncio
 import os
 import pprint
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
+import requests
 from chase import account as ch_account
-from chase import order, session, symbols
+from chase import order, session, symbols, urls
 from dotenv import load_dotenv
 
 from helperAPI import (
@@ -62,13 +64,6 @@ def chase_run(
     return None
 
 
-def get_account_id(account_connectors, value):
-    for key, val in account_connectors.items():
-        if val[0] == value:
-            return key
-    return None
-
-
 def chase_init(account: str, index: int, headless=True, botObj=None, loop=None):
     """
     Logs into chase. Checks for 2FA and gathers details on the chase accounts
@@ -121,16 +116,18 @@ def chase_init(account: str, index: int, headless=True, botObj=None, loop=None):
         account_ids = list(all_accounts.account_connectors.keys())
         print("Logged in to Chase!")
         # In the Chase Brokerage object, set the index of "Chase 1" to be its own empty array and append the chase session to the end of this array
-        chase_obj.set_logged_in_object(name, ch_session)
-        # Create empty array to store account number masks (last 4 digits of each account number)
-        print_accounts = []
+        chase_obj.set_logged_in_object(name, ch_session, "session")
+        # Index of account number "mask" (last 4 digits of each account number) to account ID
+        account_index = {}
         for acct in account_ids:
             # Create an AccountDetails Object which organizes the information in the AllAccounts class object
             account = ch_account.AccountDetails(acct, all_accounts)
             # Save account masks
             chase_obj.set_account_number(name, account.mask)
             chase_obj.set_account_totals(name, account.mask, account.account_value)
-            print_accounts.append(account.mask)
+            account_index[account.mask] = acct
+        chase_obj.set_logged_in_object(name, account_index, "account_ids")
+        print_accounts = list(account_index.keys())
         print(f"The following Chase accounts were found: {print_accounts}")
     except Exception as e:
         ch_session.close_browser()
@@ -140,6 +137,74 @@ def chase_init(account: str, index: int, headless=True, botObj=None, loop=None):
     return [chase_obj, all_accounts]
 
 
+def capture_positions_request(ch_session: session.ChaseSession, account_id):
+    """
+    Load one account's positions page and capture the positions JSON request
+
+    Returns the positions body along with a template of the request, so
+    the same call can be replayed for other accounts outside the page.
+    """
+    with ch_session.page.expect_request(urls.holdings_json()) as first:
+        ch_session.page.goto(urls.account_holdings(account_id))
+        request = first.value
+        body = request.response().json()
+    # Drop headers that requests sets itself
+    headers = {
+        name: value
+        for name, value in request.all_headers().items()
+        if not name.startswith(":") and name not in ["cookie", "content-length", "host"]
+    }
+    template = {
+        "account_id": account_id,
+        "method": request.method,
+        "url": request.url,
+        "headers": headers,
+        "post_data": request.post_data,
+        "cookies": {c["name"]: c["value"] for c in ch_session.page.context.cookies()},
+    }
+    return body, template
+
+
+def fetch_positions(template, account_id):
+    """Replay the captured positions request for another account"""
+    url = template["url"]
+    data = template["post_data"] or ""
+    # Without the account ID in the request, a replay would return the wrong account
+    if template["account_id"] not in url + data:
+        raise ValueError("Account ID not found in positions request")
+    url = url.replace(template["account_id"], account_id)
+    data = data.replace(template["account_id"], account_id) or None
+    response = requests.request(
+        template["method"],
+        url,
+        headers=template["headers"],
+        cookies=template["cookies"],
+        data=data,
+        timeout=30,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def set_chase_positions(chase_o: Brokerage, key, account, positions):
+    for position in positions:
+        if position["instrumentLongName"] == "Cash and Sweep Funds":
+            sym = position["instrumentLongName"]
+            current_price = position["marketValue"]["baseValueAmount"]
+            qty = "1"
+            chase_o.set_holdings(key, account, sym, qty, current_price)
+        elif position["assetCategoryName"] == "EQUITY":
+            try:
+                sym = position["positionComponents"][0]["securityIdDetail"][0][
+                    "symbolSecurityIdentifier"
+                ]
+            except KeyError:
+                sym = position["securityIdDetail"]["cusipIdentifier"]
+            current_price = position["marketValue"]["baseValueAmount"]
+            qty = position["tradedUnitQuantity"]
+            chase_o.set_holdings(key, account, sym, qty, current_price)
+
+
 def chase_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAccount, loop=None):
     """
     Get the holdings of chase account
@@ -151,45 +216,40 @@ def chase_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAccount, loop
     """
     # Get holdings on each account. This loop only ever runs once.
     for key in chase_o.get_account_numbers():
+        account = None
         try:
-            # Retrieve account masks and iterate through them
-            for _, account in enumerate(chase_o.get_account_numbers(key)):
-                # Retrieve the chase session
-                ch_session: session.ChaseSession = chase_o.get_logged_in_objects(key)
-                # Get the account ID accociated with mask
-                account_id = get_account_id(all_accounts.account_connectors, account)
-                data = symbols.SymbolHoldings(account_id, ch_session)
-                success = data.get_holdings()
-                if success:
-                    for i, _ in enumerate(data.positions):
-                        if (
-                            data.positions[i]["instrumentLongName"]
-                            == "Cash and Sweep Funds"
-                        ):
-                            sym = data.positions[i]["instrumentLongName"]
-                            current_price = data.positions[i]["marketValue"][
-                                "baseValueAmount"
-                            ]
-                            qty = "1"
-                            chase_o.set_holdings(key, account, sym, qty, current_price)
-                        elif data.positions[i]["assetCategoryName"] == "EQUITY":
-                            try:
-                                sym = data.positions[i]["positionComponents"][0][
-                                    "securityIdDetail"
-                                ][0]["symbolSecurityIdentifier"]
-                                current_price = data.positions[i]["marketValue"][
-                                    "baseValueAmount"
-                                ]
-                                qty = data.positions[i]["tradedUnitQuantity"]
-                            except KeyError:
-                                sym = data.positions[i]["securityIdDetail"][
-                                    "cusipIdentifier"
-                                ]
-                                current_price = data.positions[i]["marketValue"][
-                                    "baseValueAmount"
-                                ]
-                                qty = data.positions[i]["tradedUnitQuantity"]
-                            chase_o.set_holdings(key, account, sym, qty, current_price)
+            # Retrieve the chase session
+            ch_session: session.ChaseSession = chase_o.get_logged_in_objects(
+                key, "session"
+            )
+            # Iterate through account masks and their account IDs
+            account_index = chase_o.get_logged_in_objects(key, "account_ids")
+            accounts = list(account_index.items())
+            if not accounts:
+                continue
+            # The first account goes through the page to capture the request
+            account, account_id = accounts[0]
+            body, template = capture_positions_request(ch_session, account_id)
+            set_chase_positions(chase_o, key, account, body["positions"])
+            # Then the rest are fetched concurrently with the session cookies
+            with ThreadPoolExecutor() as executor:
+                futures = {
+                    account: executor.submit(fetch_positions, template, account_id)
+                    for account, account_id in accounts[1:]
+                }
+            for account, account_id in accounts[1:]:
+                try:
+                    positions = futures[account].result()["positions"]
+                except Exception as e:
+                    print(f"{key} {account}: Falling back to page holdings: {e}")
+                    data = symbols.SymbolHoldings(account_id, ch_session)
+                    if not data.get_holdings():
+                        printAndDiscord(
+                            f"{key} {account}: Error getting holdings", loop
+                        )
+                        continue
+                    positions = data.positions
+                set_chase_positions(chase_o, key, account, positions)
         except Exception as e:
             ch_session.close_browser()
             printAndDiscord(f"{key} {account}: Error getting holdings: {e}", loop)
@@ -199,6 +259,39 @@ def chase_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAccount, loop
     ch_session.close_browser()
 
 
+def get_chase_price(ask_price):
+    """Determine whether to use a MARKET or LIMIT order from the ask price"""
+    if ask_price >= 1:
+        return order.PriceType.MARKET, 0.0
+    if ask_price > 0.10:
+        # Set limit price
+        return order.PriceType.LIMIT, round(ask_price + 0.01, 2)
+    # Set limit price always round up
+    factor = 10**2
+    value = ask_price * factor
+    if value % 1 != 0:
+        value = int(value) + 1
+    return order.PriceType.LIMIT, value / factor
+
+
+def get_chase_prices(ch_session: session.ChaseSession, account_id, tickers, loop=None):
+    """Quote each ticker once and return its price type and limit price"""
+    prices = {}
+    for ticker in tickers:
+        try:
+            symbol_quote = symbols.SymbolQuote(
+                account_id=account_id,
+                session=ch_session,
+                symbol=ticker,
+            )
+        except Exception as e:
+            printAndDiscord(f"Chase: Error getting quote for {ticker}: {e}", loop)
+            print(traceback.format_exc())
+            continue
+        prices[ticker] = get_chase_price(symbol_quote.ask_price)
+    return prices
+
+
 def chase_transaction(
     chase_obj: Brokerage,
     all_accounts: ch_account.AllAccount,
@@ -222,6 +315,18 @@ def chase_transaction(
     print("==============================")
     print()
 
+    # Quote every ticker up front so each order loop starts immediately
+    prices = {}
+    if orderObj.get_action().capitalize() == "Buy":
+        for key in chase_obj.get_account_numbers():
+            account_index = chase_obj.get_logged_in_objects(key, "account_ids")
+            prices = get_chase_prices(
+                chase_obj.get_logged_in_objects(key, "session"),
+                next(iter(account_index.values())),
+                orderObj.get_stocks(),
+                loop,
+            )
+
     # Buy on each account
     for ticker in orderObj.get_stocks():
 
@@ -229,47 +334,28 @@ def chase_transaction(
         # the chase_obj via get_logged_in_objects
         for key in chase_obj.get_account_numbers():
 
-            # Declare for later
-            price_type = order.PriceType.MARKET
-            limit_price = 0.0
-
             # Load the chase session
-            ch_session: session.ChaseSession = chase_obj.get_logged_in_objects(key)
+            ch_session: session.ChaseSession = chase_obj.get_logged_in_objects(
+                key, "session"
+            )
+            account_index = chase_obj.get_logged_in_objects(key, "account_ids")
 
-            # Determine limit or market for buy orders
+            # Use the precomputed limit or market decision for buy orders
             if orderObj.get_action().capitalize() == "Buy":
-                account_ids = list(all_accounts.account_connectors.keys())
-
-                # Get the ask price and determine whether to use MARKET or LIMIT order
-                symbol_quote = symbols.SymbolQuote(
-                    account_id=account_ids[0], session=ch_session, symbol=ticker
-                )
-
-                # If it should be limit
-                if symbol_quote.ask_price < 1:
-                    price_type = order.PriceType.LIMIT
-                    if symbol_quote.ask_price > 0.10:
-                        # Set limit price
-                        limit_price = round(symbol_quote.ask_price + 0.01, 2)
-                    else:
-                        # Set limit price always round up
-                        factor = 10**2
-                        value = symbol_quote.ask_price * factor
-                        if value % 1 != 0:
-                            value = int(value) + 1
-                        limit_price = value / factor
+                if ticker not in prices:
+                    continue
+                price_type, limit_price = prices[ticker]
+            else:
+                price_type = order.PriceType.MARKET
+                limit_price = 0.0
 
             printAndDiscord(
                 f"{key} {orderObj.get_action()}ing {orderObj.get_amount()} {ticker} @ {price_type.value}",
                 loop,
             )
             try:
-                print(chase_obj.get_account_numbers())
                 # For each account number "mask" attached to "Chase_#" complete the order
-                for account in chase_obj.get_account_numbers(key):
-                    target_account_id = get_account_id(
-                        all_accounts.account_connectors, account
-                    )
+                for account, target_account_id in account_index.items():
                     # If DRY is True, don't actually make the transaction
                     if orderObj.get_dry():
                         printAndDiscord(
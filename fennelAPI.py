@@ -1,6 +1,7 @@
 import asyncio
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 from fennel_invest_api import Fennel
@@ -29,6 +30,7 @@ def fennel_init(FENNEL_EXTERNAL=None, botObj=None, loop=None):
     )
     # Log in to Fennel account
     print("Logging in to Fennel...")
+    logged_in = {}
     for index, account in enumerate(FENNEL):
         name = f"Fennel {index + 1}"
         try:
@@ -64,52 +66,91 @@ def fennel_init(FENNEL_EXTERNAL=None, botObj=None, loop=None):
                 else:
                     raise e
             fennel_obj.set_logged_in_object(name, fb, "fb")
-            account_ids = fb.get_account_ids()
-            for i, an in enumerate(account_ids):
-                account_name = f"Account {i + 1}"
-                b = fb.get_portfolio_summary(an)
-                fennel_obj.set_account_number(name, account_name)
-                fennel_obj.set_account_totals(
-                    name,
-                    account_name,
-                    b["cash"]["balance"]["canTrade"],
-                )
-                fennel_obj.set_logged_in_object(name, an, account_name)
-                print(f"Found {account_name}")
+            logged_in[name] = (fb, fb.get_account_ids())
             print(f"{name}: Logged in")
         except Exception as e:
             print(f"Error logging into Fennel: {e}")
             print(traceback.format_exc())
             continue
+    # Get portfolio summaries for every account of every login at once
+    summaries = []
+    with ThreadPoolExecutor() as executor:
+        for name, (fb, account_ids) in logged_in.items():
+            for i, an in enumerate(account_ids):
+                summaries.append(
+                    (name, i, an, executor.submit(fb.get_portfolio_summary, an))
+                )
+    for name, i, an, future in summaries:
+        account_name = f"Account {i + 1}"
+        try:
+            b = future.result()
+            fennel_obj.set_account_number(name, account_name)
+            fennel_obj.set_account_totals(
+                name,
+                account_name,
+                b["cash"]["balance"]["canTrade"],
+            )
+            fennel_obj.set_logged_in_object(name, an, account_name)
+            print(f"{name}: Found {account_name}")
+        except Exception as e:
+            print(f"{name}: Error getting {account_name} portfolio: {e}")
+            print(traceback.format_exc())
+            continue
     print("Logged into Fennel!")
     return fennel_obj
 
 
+def fennel_account_holdings(fbo: Brokerage, key: str, account: str, loop=None):
+    obj: Fennel = fbo.get_logged_in_objects(key, "fb")
+    account_id = fbo.get_logged_in_objects(key, account)
+    try:
+        # Get account holdings
+        positions = obj.get_stock_holdings(account_id)
+        if positions != []:
+            for holding in positions:
+                qty = holding["investment"]["ownedShares"]
+                if float(qty) == 0:
+                    continue
+                sym = holding["security"]["ticker"]
+                cp = holding["security"]["currentStockPrice"]
+                if cp is None:
+                    cp = "N/A"
+                fbo.set_holdings(key, account, sym, qty, cp)
+    except Exception as e:
+        printAndDiscord(f"Error getting Fennel holdings: {e}")
+        print(traceback.format_exc())
+
+
 def fennel_holdings(fbo: Brokerage, loop=None):
-    for key in fbo.get_account_numbers():
-        for account in fbo.get_account_numbers(key):
-            obj: Fennel = fbo.get_logged_in_objects(key, "fb")
-            account_id = fbo.get_logged_in_objects(key, account)
-            try:
-                # Get account holdings
-                positions = obj.get_stock_holdings(account_id)
-                if positions != []:
-                    for holding in positions:
-                        qty = holding["investment"]["ownedShares"]
-                        if float(qty) == 0:
-                            continue
-                        sym = holding["security"]["ticker"]
-                        cp = holding["security"]["currentStockPrice"]
-                        if cp is None:
-                            cp = "N/A"
-                        fbo.set_holdings(key, account, sym, qty, cp)
-            except Exception as e:
-                printAndDiscord(f"Error getting Fennel holdings: {e}")
-                print(traceback.format_exc())
-                continue
+    # Each account is a separate request, so get them all at once
+    with ThreadPoolExecutor() as executor:
+        for key in fbo.get_account_numbers():
+            for account in fbo.get_account_numbers(key):
+                executor.submit(fennel_account_holdings, fbo, key, account, loop)
     printHoldings(fbo, loop, False)
 
 
+def fennel_place_order(
+    obj: Fennel, account_id: str, s: str, orderObj: stockOrder
+) -> str:
+    order = obj.place_order(
+        account_id=account_id,
+        ticker=s,
+        quantity=orderObj.get_amount(),
+        side=orderObj.get_action(),
+        dry_run=orderObj.get_dry(),
+    )
+    if orderObj.get_dry():
+        message = "Dry Run Success"
+        if not order.get("dry_run_success", False):
+            message = "Dry Run Failed"
+    else:
+        message = "Success"
+        if order.get("data", {}).get("createOrder") != "pending":
+            message = order.get("data", {}).get("createOrder")
+    return message
+
+
 def fennel_transaction(fbo: Brokerage, orderObj: stockOrder, loop=None):
     print()
     print("==============================")
@@ -117,35 +158,28 @@ def fennel_transaction(fbo: Brokerage, orderObj: stockOrder, loop=None):
     print("==============================")
     print()
     for s in orderObj.get_stocks():
+        # Submit every account leg for this ticker at once
+        legs = {}
+        with ThreadPoolExecutor() as executor:
+            for key in fbo.get_account_numbers():
+                obj: Fennel = fbo.get_logged_in_objects(key, "fb")
+                for account in fbo.get_account_numbers(key):
+                    account_id = fbo.get_logged_in_objects(key, account)
+                    legs[(key, account)] = executor.submit(
+                        fennel_place_order, obj, account_id, s, orderObj
+                    )
+        # One summary message per login
         for key in fbo.get_account_numbers():
-            printAndDiscord(
-                f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}",
-                loop,
-            )
+            summary = [
+                f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}"
+            ]
             for account in fbo.get_account_numbers(key):
-                obj: Fennel = fbo.get_logged_in_objects(key, "fb")
-                account_id = fbo.get_logged_in_objects(key, account)
                 try:
-                    order = obj.place_order(
-                        account_id=account_id,
-                        ticker=s,
-                        quantity=orderObj.get_amount(),
-                        side=orderObj.get_action(),
-                        dry_run=orderObj.get_dry(),
-                    )
-                    if orderObj.get_dry():
-                        message = "Dry Run Success"
-                        if not order.get("dry_run_success", False):
-                            message = "Dry Run Failed"
-                    else:
-                        message = "Success"
-                        if order.get("data", {}).get("createOrder") != "pending":
-                            message = order.get("data", {}).get("createOrder")
-                    printAndDiscord(
-                        f"{key}: {orderObj.get_action()} {orderObj.get_amount()} of {s} in {account}: {message}",
-                        loop,
+                    message = legs[(key, account)].result()
+                    summary.append(
+                        f"{orderObj.get_action()} {orderObj.get_amount()} of {s} in {account}: {message}"
                     )
                 except Exception as e:
-                    printAndDiscord(f"{key} {account}: Error placing order: {e}", loop)
+                    summary.append(f"{account}: Error placing order: {e}")
                     print(traceback.format_exc())
-                    continue
+            printAndDiscord("\n".join(summary), loop)
@@ -180,6 +180,22 @@ def fidelity_holdings(fidelity_o: Brokerage, name: str, loop=None):
     fidelity_browser.close_browser()
 
 
+def get_positions_index(account_dict: dict):
+    """
+    Index the downloaded positions by ticker
+
+    Returns:
+        dict: ticker -> {account number: quantity}
+    """
+    positions = {}
+    for account_number, account in account_dict.items():
+        for d in account["stocks"]:
+            if d.get("ticker") is None or d.get("quantity") is None:
+                continue
+            positions.setdefault(d["ticker"], {})[account_number] = d["quantity"]
+    return positions
+
+
 def fidelity_transaction(
     fidelity_o: Brokerage, name: str, orderObj: stockOrder, loop=None
 ):
@@ -203,6 +219,10 @@ def fidelity_transaction(
     )
     # Get full list of accounts in case some had no holdings
     fidelity_browser.get_list_of_accounts()
+    # Index the downloaded positions once to filter sells
+    positions = get_positions_index(fidelity_browser.account_dict)
+    # Whether the trade page has been used for a previous stock
+    traded = False
     # Go trade
     for stock in orderObj.get_stocks():
         # Say what we are doing
@@ -210,17 +230,18 @@ def fidelity_transaction(
             f"{name}: {orderObj.get_action()}ing {orderObj.get_amount()} of {stock}",
             loop,
         )
-        # Reload the page incase we were trading before
-        fidelity_browser.page.reload()
-        for account_number in fidelity_browser.account_dict:
-            # If we are selling, check to see if the account has the stock to sell
-            if (
-                orderObj.get_action().lower() == "sell"
-                and stock not in fidelity_browser.get_stocks_in_account(account_number)
-            ):
-                # Doesn't have it, skip account
-                continue
-
+        # If we are selling, only go to accounts that have the stock to sell
+        if orderObj.get_action().lower() == "sell":
+            accounts = list(positions.get(stock, {}))
+        else:
+            accounts = list(fidelity_browser.account_dict)
+        if not accounts:
+            continue
+        # Reload the page if we were trading a different stock before
+        if traded:
+            fidelity_browser.page.reload()
+        traded = True
+        for account_number in accounts:
             # Go trade for all accounts for that stock
             success, error_message = fidelity_browser.transaction(
                 stock,
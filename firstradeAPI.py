@@ -5,7 +5,9 @@ import asyncio
 import os
 import pprint
 import traceback
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep, time
 
 from dotenv import load_dotenv
 from firstrade import account as ft_account
@@ -21,6 +23,27 @@ from helperAPI import (
     stockOrder,
 )
 
+MAX_FT_WORKERS = 4  # Accounts traded at once per session
+FILL_TIMEOUT = 10  # Seconds to wait for the dance buy to fill before selling
+FILL_POLL_INTERVAL = 0.25  # Seconds between order status checks
+QUOTE_TTL = 5  # Seconds to reuse a quote
+QUOTE_CACHE = {}  # Symbol -> (time fetched, SymbolQuote)
+QUOTE_LOCKS = {}  # Symbol -> Lock, so each symbol is only fetched once
+QUOTE_LOCKS_LOCK = Lock()
+
+
+def get_quote(obj: ft_account.FTSession, account: str, symbol: str):
+    # Quotes are the same for every account, so cache them briefly
+    with QUOTE_LOCKS_LOCK:
+        symbol_lock = QUOTE_LOCKS.setdefault(symbol, Lock())
+    with symbol_lock:
+        cached = QUOTE_CACHE.get(symbol)
+        if cached is not None and time() - cached[0] < QUOTE_TTL:
+            return cached[1]
+        quote = symbols.SymbolQuote(obj, account, symbol)
+        QUOTE_CACHE[symbol] = (time(), quote)
+        return quote
+
 
 def firstrade_init(botObj=None, loop=None):
     # Initialize .env file
@@ -98,7 +121,7 @@ def firstrade_holdings(firstrade_o: Brokerage, loop=None):
                 for item in data["items"]:
                     symbol = item["symbol"]
                     try:
-                        quote = symbols.SymbolQuote(obj, account, symbol)
+                        quote = get_quote(obj, account, symbol)
                         price = quote.last
                     except QuoteRequestError:
                         price = 0
@@ -116,168 +139,230 @@ def firstrade_holdings(firstrade_o: Brokerage, loop=None):
     printHoldings(firstrade_o, loop)
 
 
+def wait_for_fill(
+    account_data: ft_account.FTAccountData, account: str, order_conf: dict
+):
+    # Poll order status instead of sleeping a fixed time before selling
+    order_id = str(order_conf.get("result", {}).get("order_id", ""))
+    if account_data is None or order_id == "":
+        sleep(1)
+        return False
+    deadline = time() + FILL_TIMEOUT
+    while time() < deadline:
+        try:
+            orders = account_data.get_orders(account).get("items", [])
+        except Exception as e:
+            # Fall back to the old fixed wait rather than polling a broken endpoint
+            print(f"Error checking order status: {e}")
+            sleep(1)
+            return False
+        for o in orders:
+            if "order_id" not in o or "status" not in o:
+                # Unknown order format, so fall back to the old fixed wait
+                sleep(1)
+                return False
+            if str(o["order_id"]) != order_id:
+                continue
+            status = str(o["status"]).lower()
+            if "execut" in status or "fill" in status:
+                return True
+        sleep(FILL_POLL_INTERVAL)
+    return False
+
+
+def firstrade_place_order(
+    obj: ft_account.FTSession,
+    account: str,
+    s: str,
+    price_type,
+    order_type,
+    quantity,
+    price,
+    dry_run: bool,
+) -> dict:
+    ft_order = order.Order(obj)
+    return ft_order.place_order(
+        account=account,
+        symbol=s,
+        price_type=price_type,
+        order_type=order_type,
+        quantity=quantity,
+        duration=order.Duration.DAY,
+        price=price,
+        dry_run=dry_run,
+    )
+
+
+def firstrade_account_transaction(
+    obj: ft_account.FTSession,
+    account_data: ft_account.FTAccountData,
+    key: str,
+    account: str,
+    s: str,
+    orderObj: stockOrder,
+    loop=None,
+):
+    print_account = maskString(account)
+    amount = orderObj.get_amount()
+    action = orderObj.get_action()
+    try:
+        should_dance = False
+        symbol_data = get_quote(obj, account, s)
+        if symbol_data.last < 1.00:
+            if int(amount) < 100:
+                should_dance = True
+            price_type = order.PriceType.LIMIT
+            price_label = "limit"
+            if action.capitalize() == "Buy":
+                price = symbol_data.last + 0.01
+            else:
+                price = symbol_data.last - 0.01
+        else:
+            price_type = order.PriceType.MARKET
+            price_label = "market"
+            price = 0.00
+        if action.capitalize() == "Buy":
+            order_type = order.OrderType.BUY
+        else:
+            order_type = order.OrderType.SELL
+        printAndDiscord(
+            f"{key} {print_account}: {action}ing {amount} {s} @ {price_label}",
+            loop,
+        )
+        if should_dance and action == "buy":
+            # Do the dance
+            quantity = 100
+            printAndDiscord(
+                f"Buying {quantity} then selling {quantity - amount} of {s}",
+                loop,
+            )
+            order_conf = firstrade_place_order(
+                obj,
+                account,
+                s,
+                price_type,
+                order_type,
+                quantity,
+                price,
+                orderObj.get_dry(),
+            )
+            print("The buy order verification produced the following messages: ")
+            pprint.pprint(order_conf)
+            buy_success = order_conf["error"] == ""
+            printAndDiscord(
+                (
+                    f"{key} account {print_account}: The buy order verification was successful"
+                    if buy_success
+                    else f"{key} account {print_account}: The buy order verification was unsuccessful"
+                ),
+                loop,
+            )
+            if not buy_success:
+                printAndDiscord(
+                    f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
+                    loop,
+                )
+                raise Exception(f"Error buying {quantity} of {s}")
+            # Sell as soon as the buy fills
+            if not orderObj.get_dry() and not wait_for_fill(
+                account_data, account, order_conf
+            ):
+                print(f"{key} account {print_account}: Buy not filled yet, selling")
+            symbol_data = get_quote(obj, account, s)
+            price = symbol_data.last - 0.01
+            order_conf = firstrade_place_order(
+                obj,
+                account,
+                s,
+                price_type,
+                order.OrderType.SELL,
+                quantity - amount,
+                price,
+                orderObj.get_dry(),
+            )
+            print("The sell order verification produced the following messages: ")
+            pprint.pprint(order_conf)
+            sell_success = order_conf["error"] == ""
+            printAndDiscord(
+                (
+                    f"{key} account {print_account}: The sell order verification was successful"
+                    if sell_success
+                    else f"{key} account {print_account}: The sell order verification was unsuccessful"
+                ),
+                loop,
+            )
+            if not sell_success:
+                printAndDiscord(
+                    f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
+                    loop,
+                )
+                raise Exception(f"Error selling {quantity - amount} of {s}")
+        else:
+            # Normal buy/sell
+            order_conf = firstrade_place_order(
+                obj,
+                account,
+                s,
+                price_type,
+                order_type,
+                amount,
+                price,
+                orderObj.get_dry(),
+            )
+            print("The order verification produced the following messages: ")
+            pprint.pprint(order_conf)
+            order_success = order_conf["error"] == ""
+            printAndDiscord(
+                (
+                    f"{key} account {print_account}: The order verification was successful"
+                    if order_success
+                    else f"{key} account {print_account}: The order verification was unsuccessful"
+                ),
+                loop,
+            )
+            if not order_success:
+                printAndDiscord(
+                    f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
+                    loop,
+                )
+    except Exception as e:
+        printAndDiscord(f"{key} {print_account}: Error submitting order: {e}", loop)
+        print(traceback.format_exc())
+
+
 def firstrade_transaction(firstrade_o: Brokerage, orderObj: stockOrder, loop=None):
     print()
     print("==============================")
     print("Firstrade")
     print("==============================")
     print()
+    # If DRY is True, don't actually make the transaction
+    if orderObj.get_dry():
+        printAndDiscord("Running in DRY mode. No transactions will be made.", loop)
+    # Account data is only used to check order status, so build it once per session
+    account_data = {}
+    if not orderObj.get_dry():
+        for key in firstrade_o.get_account_numbers():
+            try:
+                account_data[key] = ft_account.FTAccountData(
+                    firstrade_o.get_logged_in_objects(key)
+                )
+            except Exception as e:
+                print(f"{key}: Error getting account data, using fixed waits: {e}")
     # Buy on each account
     for s in orderObj.get_stocks():
         for key in firstrade_o.get_account_numbers():
-            for account in firstrade_o.get_account_numbers(key):
-                obj: ft_account.FTSession = firstrade_o.get_logged_in_objects(key)
-                print_account = maskString(account)
-                # If DRY is True, don't actually make the transaction
-                if orderObj.get_dry():
-                    printAndDiscord(
-                        "Running in DRY mode. No transactions will be made.", loop
-                    )
-                old_amount = orderObj.get_amount()
-                original_action = orderObj.get_action()
-                try:
-                    should_dance = False
-                    symbol_data = symbols.SymbolQuote(obj, account, s)
-                    if symbol_data.last < 1.00:
-                        if int(orderObj.get_amount()) < 100:
-                            should_dance = True
-                        price_type = order.PriceType.LIMIT
-                        orderObj.set_price("limit")
-                        if orderObj.get_action().capitalize() == "Buy":
-                            price = symbol_data.last + 0.01
-                        else:
-                            price = symbol_data.last - 0.01
-                    else:
-                        price_type = order.PriceType.MARKET
-                        orderObj.set_price("market")
-                        price = 0.00
-                    if orderObj.get_action().capitalize() == "Buy":
-                        order_type = order.OrderType.BUY
-                    else:
-                        order_type = order.OrderType.SELL
-                    printAndDiscord(
-                        f"{key} {orderObj.get_action()}ing {orderObj.get_amount()} {s} @ {orderObj.get_price()}",
+            obj: ft_account.FTSession = firstrade_o.get_logged_in_objects(key)
+            # Accounts under one session can be traded at the same time
+            with ThreadPoolExecutor(max_workers=MAX_FT_WORKERS) as executor:
+                for account in firstrade_o.get_account_numbers(key):
+                    executor.submit(
+                        firstrade_account_transaction,
+                        obj,
+                        account_data.get(key),
+                        key,
+                        account,
+                        s,
+                        orderObj,
                         loop,
                     )
-                    if should_dance and orderObj.get_action() == "buy":
-                        # Do the dance
-                        quantity = 100
-                        printAndDiscord(
-                            f"Buying {quantity} then selling {quantity - orderObj.get_amount()} of {s}",
-                            loop,
-                        )
-                        orderObj.set_amount(quantity)
-                        ft_order = order.Order(obj)
-                        order_conf = ft_order.place_order(
-                            account=account,
-                            symbol=s,
-                            price_type=price_type,
-                            order_type=order_type,
-                            quantity=orderObj.get_amount(),
-                            duration=order.Duration.DAY,
-                            price=price,
-                            dry_run=orderObj.get_dry(),
-                        )
-                        print(
-                            "The buy order verification produced the following messages: "
-                        )
-                        pprint.pprint(order_conf)
-                        buy_success = order_conf["error"] == ""
-                        printAndDiscord(
-                            (
-                                f"{key} account {print_account}: The buy order verification was "
-                                + "successful"
-                                if buy_success
-                                else f"{key} account {print_account}: The sell order verification was unsuccessful"
-                            ),
-                            loop,
-                        )
-                        if not buy_success:
-                            printAndDiscord(
-                                f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
-                                loop,
-                            )
-                            raise Exception(f"Error buying {quantity} of {s}")
-                        orderObj.set_amount(quantity - old_amount)
-                        # Rest before selling
-                        sleep(1)
-                        symbol_data = symbols.SymbolQuote(obj, account, s)
-                        price = symbol_data.last - 0.01
-                        ft_order = order.Order(obj)
-                        order_conf = ft_order.place_order(
-                            account=account,
-                            symbol=s,
-                            price_type=price_type,
-                            order_type=order.OrderType.SELL,
-                            quantity=orderObj.get_amount(),
-                            duration=order.Duration.DAY,
-                            price=price,
-                            dry_run=orderObj.get_dry(),
-                        )
-                        print(
-                            "The sell order verification produced the following messages: "
-                        )
-                        pprint.pprint(order_conf)
-                        sell_success = order_conf["error"] == ""
-                        printAndDiscord(
-                            (
-                                f"{key} account {print_account}: The sell order verification was "
-                                + "successful"
-                                if sell_success
-                                else f"{key} account {print_account}: The sell order verification was unsuccessful"
-                            ),
-                            loop,
-                        )
-                        if not sell_success:
-                            printAndDiscord(
-                                f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
-                                loop,
-                            )
-                            raise Exception(
-                                f"Error selling {quantity - old_amount} of {s}"
-                            )
-                    else:
-                        # Normal buy/sell
-                        ft_order = order.Order(obj)
-                        order_conf = ft_order.place_order(
-                            account=account,
-                            symbol=s,
-                            price_type=price_type,
-                            order_type=order_type,
-                            quantity=orderObj.get_amount(),
-                            duration=order.Duration.DAY,
-                            price=price,
-                            dry_run=orderObj.get_dry(),
-                        )
-                        print(
-                            "The order verification produced the following messages: "
-                        )
-                        pprint.pprint(order_conf)
-                        order_success = order_conf["error"] == ""
-                        printAndDiscord(
-                            (
-                                f"{key} account {print_account}: The order verification was "
-                                + "successful"
-                                if order_success
-                                else f"{key} account {print_account}: The sell order verification was unsuccessful"
-                            ),
-                            loop,
-                        )
-                        if not order_success:
-                            printAndDiscord(
-                                f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
-                                loop,
-                            )
-                except Exception as e:
-                    printAndDiscord(
-                        f"{key} {print_account}: Error submitting order: {e}", loop
-                    )
-                    print(traceback.format_exc())
-                    continue
-
-                finally:
-                    # Restore orderObj
-                    orderObj.set_amount(old_amount)
-                    orderObj.set_action(original_action)
-                sleep(1)
-                print()
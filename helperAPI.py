@@ -5,14 +5,15 @@
 import asyncio
 import os
 import pickle
+import re
 import subprocess
 import sys
 import textwrap
 import traceback
 from pathlib import Path
 from queue import Queue
-from threading import Thread
-from time import sleep
+from threading import Lock, Thread
+from time import monotonic, sleep
 
 import pkg_resources
 import requests
@@ -30,6 +31,11 @@ SORT_BROKERS = os.getenv("SORT_BROKERS", "true").lower() != "false"
 
 # Create task queue
 task_queue = Queue()
+# Messages are queued from many threads, so scheduling the processor is locked
+task_queue_lock = Lock()
+task_queue_processing = False
+# Logins waiting for an OTP code from Discord (only touched on the bot loop)
+PENDING_OTP = []
 
 
 class stockOrder:
@@ -207,6 +213,7 @@ class Brokerage:
         self.__holdings: dict = {}  # Dictionary of holdings under parent
         self.__account_totals: dict = {}  # Dictionary of account totals
         self.__account_types: dict = {}  # Dictionary of account types
+        self.__lock = Lock()  # Accounts may be updated from multiple threads
 
     def set_name(self, name: str):
         if not isinstance(name, str):
@@ -240,34 +247,36 @@ class Brokerage:
             quantity = 0
         if isinstance(price, str) and price.lower() == "n/a":
             price = 0
-        if parent_name not in self.__holdings:
-            self.__holdings[parent_name] = {}
-        if account_name not in self.__holdings[parent_name]:
-            self.__holdings[parent_name][account_name] = {}
-        self.__holdings[parent_name][account_name][stock] = {
-            "quantity": float(quantity),
-            "price": round(float(price), 2),
-            "total": round(float(quantity) * float(price), 2),
-        }
-        # Alphabetize by stock
-        self.__holdings[parent_name][account_name] = dict(
-            sorted(
-                self.__holdings[parent_name][account_name].items(),
-                key=lambda item: item[0],
+        with self.__lock:
+            if parent_name not in self.__holdings:
+                self.__holdings[parent_name] = {}
+            if account_name not in self.__holdings[parent_name]:
+                self.__holdings[parent_name][account_name] = {}
+            self.__holdings[parent_name][account_name][stock] = {
+                "quantity": float(quantity),
+                "price": round(float(price), 2),
+                "total": round(float(quantity) * float(price), 2),
+            }
+            # Alphabetize by stock
+            self.__holdings[parent_name][account_name] = dict(
+                sorted(
+                    self.__holdings[parent_name][account_name].items(),
+                    key=lambda item: item[0],
+                )
             )
-        )
 
     def set_account_totals(self, parent_name: str, account_name: str, total: float):
         if isinstance(total, str):
             total = total.replace(",", "").replace("$", "").strip()
-        if parent_name not in self.__account_totals:
-            self.__account_totals[parent_name] = {}
-        self.__account_totals[parent_name][account_name] = round(float(total), 2)
-        self.__account_totals[parent_name]["total"] = sum(
-            value
-            for key, value in self.__account_totals[parent_name].items()
-            if key != "total"
-        )
+        with self.__lock:
+            if parent_name not in self.__account_totals:
+                self.__account_totals[parent_name] = {}
+            self.__account_totals[parent_name][account_name] = round(float(total), 2)
+            self.__account_totals[parent_name]["total"] = sum(
+                value
+                for key, value in self.__account_totals[parent_name].items()
+                if key != "total"
+            )
 
     def set_account_type(self, parent_name: str, account_name: str, account_type: str):
         if parent_name not in self.__account_types:
@@ -352,6 +361,22 @@ class ThreadHandler:
         return self.queue.get()
 
 
+class RateLimiter:
+    # Spaces out calls shared between threads to at most per_second per second
+    def __init__(self, per_second: float):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self.lock = Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            sleep(wait_time)
+
+
 def is_up_to_date(remote, branch):
     # Assume succeeded in updater()
     import git
@@ -656,22 +681,52 @@ async def processTasks(message, embed=False):
 
 
 def printAndDiscord(message, loop=None, embed=False):
+    global task_queue_processing
     # Print message
     if not embed:
         print(message)
     # Add message to discord queue
     if loop is not None:
-        task_queue.put((message, embed))
-        if task_queue.qsize() == 1:
-            asyncio.run_coroutine_threadsafe(processQueue(), loop)
+        with task_queue_lock:
+            task_queue.put((message, embed))
+            # Only start the processor if it isn't already running
+            if task_queue_processing:
+                return
+            task_queue_processing = True
+        asyncio.run_coroutine_threadsafe(processQueue(), loop)
 
 
 async def processQueue():
+    global task_queue_processing
     # Process discord queue
-    while not task_queue.empty():
-        message, embed = task_queue.get()
-        await processTasks(message, embed)
-        task_queue.task_done()
+    try:
+        while True:
+            with task_queue_lock:
+                # Stop under the lock so a new message restarts the processor
+                if task_queue.empty():
+                    task_queue_processing = False
+                    return
+                message, embed = task_queue.get()
+            await processTasks(message, embed)
+            task_queue.task_done()
+    except BaseException:
+        # Let the next message start a new processor
+        with task_queue_lock:
+            task_queue_processing = False
+        raise
+
+
+def otp_message_for(content: str, brokerName: str) -> str | None:
+    # Work out if a Discord message is meant for this pending login
+    content = content.strip()
+    # "<broker name> <code>" always goes to that login
+    match = re.match(rf"{re.escape(brokerName)}(?!\d)\s*:?\s*(.*)$", content, re.I)
+    if match is not None:
+        return match.group(1)
+    # Otherwise only if it's the only login waiting, or cancelling all
+    if len(PENDING_OTP) == 1 or content.lower() == "cancel":
+        return content
+    return None
 
 
 async def getOTPCodeDiscord(
@@ -681,35 +736,48 @@ async def getOTPCodeDiscord(
     printAndDiscord(
         f"Please enter OTP code or type cancel within {timeout} seconds", loop
     )
-    # Get OTP code from Discord
-    while True:
-        try:
-            code = await botObj.wait_for(
-                "message",
-                # Ignore bot messages and messages not in the correct channel
-                check=lambda m: m.author != botObj.user
-                and m.channel.id == int(os.getenv("DISCORD_CHANNEL")),
-                timeout=timeout,
-            )
-        except asyncio.TimeoutError:
-            printAndDiscord(
-                f"Timed out waiting for OTP code input for {brokerName}", loop
-            )
-            return None
-        if code.content.lower() == "cancel":
-            printAndDiscord(f"Cancelling OTP code for {brokerName}", loop)
-            return None
-        try:
-            # Check if code is numbers only
-            int(code.content)
-        except ValueError:
-            printAndDiscord("OTP code must be numbers only", loop)
-            continue
-        # Check if code is correct length
-        if len(code.content) != code_len:
-            printAndDiscord(f"OTP code must be {code_len} digits", loop)
-            continue
-        return code.content
+    PENDING_OTP.append(brokerName)
+    if len(PENDING_OTP) > 1:
+        printAndDiscord(
+            f"Multiple logins are waiting for codes ({', '.join(PENDING_OTP)}), "
+            + f"so reply with the name first, e.g. '{brokerName} 123456'",
+            loop,
+        )
+    try:
+        # Get OTP code from Discord
+        while True:
+            try:
+                message = await botObj.wait_for(
+                    "message",
+                    # Ignore bot messages, messages not in the correct channel,
+                    # and messages meant for other logins
+                    check=lambda m: m.author != botObj.user
+                    and m.channel.id == int(os.getenv("DISCORD_CHANNEL"))
+                    and otp_message_for(m.content, brokerName) is not None,
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                printAndDiscord(
+                    f"Timed out waiting for OTP code input for {brokerName}", loop
+                )
+                return None
+            code = otp_message_for(message.content, brokerName)
+            if code.lower() == "cancel":
+                printAndDiscord(f"Cancelling OTP code for {brokerName}", loop)
+                return None
+            try:
+                # Check if code is numbers only
+                int(code)
+            except ValueError:
+                printAndDiscord("OTP code must be numbers only", loop)
+                continue
+            # Check if code is correct length
+            if len(code) != code_len:
+                printAndDiscord(f"OTP code must be {code_len} digits", loop)
+                continue
+            return code
+    finally:
+        PENDING_OTP.remove(brokerName)
 
 
 async def getUserInputDiscord(botObj: commands.Bot, prompt, timeout=60, loop=None):
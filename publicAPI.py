@@ -1,6 +1,7 @@
 import asyncio
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 from public_invest_api import Public
@@ -15,6 +16,54 @@ from helperAPI import (
 )
 
 
+def public_login(index: int, account: str, botObj=None, loop=None):
+    name = f"Public {index + 1}"
+    try:
+        account = account.split(":")
+        pb = Public(filename=f"public{index + 1}.pkl", path="./creds/")
+        try:
+            if botObj is None and loop is None:
+                # Login from CLI
+                pb.login(
+                    username=account[0],
+                    password=account[1],
+                    wait_for_2fa=True,
+                )
+            else:
+                # Login from Discord and check for 2fa required message
+                pb.login(
+                    username=account[0],
+                    password=account[1],
+                    wait_for_2fa=False,
+                )
+        except Exception as e:
+            if "2FA" in str(e) and botObj is not None and loop is not None:
+                # Sometimes codes take a long time to arrive
+                timeout = 300  # 5 minutes
+                sms_code = asyncio.run_coroutine_threadsafe(
+                    getOTPCodeDiscord(botObj, name, timeout=timeout, loop=loop),
+                    loop,
+                ).result()
+                if sms_code is None:
+                    raise Exception("No SMS code found")
+                pb.login(
+                    username=account[0],
+                    password=account[1],
+                    wait_for_2fa=False,
+                    code=sms_code,
+                )
+            else:
+                raise e
+        # Public only has one account
+        an = pb.get_account_number()
+        print(f"{name}: Found account {maskString(an)}")
+        return pb, an, pb.get_account_type(), pb.get_account_cash()
+    except Exception as e:
+        print(f"Error logging in to Public: {e}")
+        print(traceback.format_exc())
+        return None
+
+
 def public_init(PUBLIC_EXTERNAL=None, botObj=None, loop=None):
     # Initialize .env file
     load_dotenv()
@@ -30,82 +79,62 @@ def public_init(PUBLIC_EXTERNAL=None, botObj=None, loop=None):
     )
     # Log in to Public account
     print("Logging in to Public...")
-    for index, account in enumerate(PUBLIC):
-        name = f"Public {index + 1}"
-        try:
-            account = account.split(":")
-            pb = Public(filename=f"public{index + 1}.pkl", path="./creds/")
-            try:
-                if botObj is None and loop is None:
-                    # Login from CLI
-                    pb.login(
-                        username=account[0],
-                        password=account[1],
-                        wait_for_2fa=True,
-                    )
-                else:
-                    # Login from Discord and check for 2fa required message
-                    pb.login(
-                        username=account[0],
-                        password=account[1],
-                        wait_for_2fa=False,
-                    )
-            except Exception as e:
-                if "2FA" in str(e) and botObj is not None and loop is not None:
-                    # Sometimes codes take a long time to arrive
-                    timeout = 300  # 5 minutes
-                    sms_code = asyncio.run_coroutine_threadsafe(
-                        getOTPCodeDiscord(botObj, name, timeout=timeout, loop=loop),
-                        loop,
-                    ).result()
-                    if sms_code is None:
-                        raise Exception("No SMS code found")
-                    pb.login(
-                        username=account[0],
-                        password=account[1],
-                        wait_for_2fa=False,
-                        code=sms_code,
-                    )
-                else:
-                    raise e
-            # Public only has one account
-            public_obj.set_logged_in_object(name, pb)
-            an = pb.get_account_number()
-            public_obj.set_account_number(name, an)
-            print(f"{name}: Found account {maskString(an)}")
-            atype = pb.get_account_type()
-            public_obj.set_account_type(name, an, atype)
-            cash = pb.get_account_cash()
-            public_obj.set_account_totals(name, an, cash)
-        except Exception as e:
-            print(f"Error logging in to Public: {e}")
-            print(traceback.format_exc())
+    # From Discord, log in to all at once since 2FA codes are routed
+    # to the right login. From the CLI, input prompts can't be shared
+    max_workers = 1 if botObj is None and loop is None else len(PUBLIC)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        logins = list(
+            executor.map(
+                lambda item: public_login(item[0], item[1], botObj, loop),
+                enumerate(PUBLIC),
+            )
+        )
+    for index, login in enumerate(logins):
+        if login is None:
             continue
+        name = f"Public {index + 1}"
+        pb, an, atype, cash = login
+        public_obj.set_logged_in_object(name, pb)
+        public_obj.set_account_number(name, an)
+        public_obj.set_account_type(name, an, atype)
+        public_obj.set_account_totals(name, an, cash)
     print("Logged in to Public!")
     return public_obj
 
 
+def get_symbol_price(obj: Public, sym: str):
+    try:
+        return obj.get_symbol_price(sym)
+    except Exception:
+        return "N/A"
+
+
 def public_holdings(pbo: Brokerage, loop=None):
+    all_positions = []
     for key in pbo.get_account_numbers():
         for account in pbo.get_account_numbers(key):
             obj: Public = pbo.get_logged_in_objects(key)
             try:
                 # Get account holdings
                 positions = obj.get_positions()
-                if positions != []:
-                    for holding in positions:
-                        # Get symbol, quantity, and total value
-                        sym = holding["instrument"]["symbol"]
-                        qty = float(holding["quantity"])
-                        try:
-                            current_price = obj.get_symbol_price(sym)
-                        except Exception:
-                            current_price = "N/A"
-                        pbo.set_holdings(key, account, sym, qty, current_price)
+                for holding in positions:
+                    all_positions.append((key, account, obj, holding))
             except Exception as e:
                 printAndDiscord(f"{key}: Error getting account holdings: {e}", loop)
                 traceback.format_exc()
                 continue
+    # Get each symbol's price once, shared by all logins, all at once
+    prices = {}
+    with ThreadPoolExecutor() as executor:
+        for _, _, obj, holding in all_positions:
+            sym = holding["instrument"]["symbol"]
+            if sym not in prices:
+                prices[sym] = executor.submit(get_symbol_price, obj, sym)
+    for key, account, _, holding in all_positions:
+        # Get symbol, quantity, and total value
+        sym = holding["instrument"]["symbol"]
+        qty = float(holding["quantity"])
+        pbo.set_holdings(key, account, sym, qty, prices[sym].result())
     printHoldings(pbo, loop)
 
 
@@ -2,20 +2,90 @@
 # Robinhood API
 
 import os
+import threading
 import traceback
+from contextlib import contextmanager
 
+import pyotp
+import requests
 import robin_stocks.robinhood as rh
 from dotenv import load_dotenv
+from robin_stocks.robinhood import authentication as rh_authentication
+from robin_stocks.robinhood import globals as rh_globals
+from robin_stocks.robinhood import helper as rh_helper
 
-from helperAPI import Brokerage, maskString, printAndDiscord, printHoldings, stockOrder
+from helperAPI import (
+    Brokerage,
+    ThreadHandler,
+    maskString,
+    printAndDiscord,
+    printHoldings,
+    stockOrder,
+)
 
 
-def login_with_cache(pickle_path, pickle_name):
-    rh.login(
-        expiresIn=86400 * 30,  # 30 days
-        pickle_path=pickle_path,
-        pickle_name=pickle_name,
-    )
+class _ThreadSession:
+    # robin_stocks keeps one global requests session for every call, so
+    # route each thread to the session of the client it is running for
+    def __init__(self, default: requests.Session):
+        self._default = default
+        self._local = threading.local()
+
+    def bind(self, session: requests.Session | None):
+        self._local.session = session
+
+    def current(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        return session if session is not None else self._default
+
+    def __getattr__(self, attr):
+        return getattr(self.current(), attr)
+
+
+# Install router everywhere robin_stocks imported SESSION
+_DEFAULT_SESSION = rh_globals.SESSION
+SESSION_ROUTER = _ThreadSession(_DEFAULT_SESSION)
+for _module in (rh_globals, rh_helper, rh_authentication):
+    if hasattr(_module, "SESSION"):
+        _module.SESSION = SESSION_ROUTER
+
+
+class RobinhoodClient:
+    """
+    Per-credential Robinhood client with its own HTTP session and token.
+    Any robin_stocks.robinhood function can be called on it, e.g.
+    client.get_open_stock_positions(), and will run with this client's session.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.session = requests.Session()
+        self.session.headers.update(_DEFAULT_SESSION.headers)
+
+    @contextmanager
+    def bound(self):
+        previous = getattr(SESSION_ROUTER._local, "session", None)
+        SESSION_ROUTER.bind(self.session)
+        try:
+            yield self
+        finally:
+            SESSION_ROUTER.bind(previous)
+
+    def __getattr__(self, attr):
+        func = getattr(rh, attr)
+        if not callable(func):
+            return func
+
+        def wrapper(*args, **kwargs):
+            with self.bound():
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def get_2fa_code(secret):
+    totp = pyotp.TOTP(secret)
+    return totp.now()
 
 
 def robinhood_init(ROBINHOOD_EXTERNAL=None, botObj=None, loop=None):
@@ -37,23 +107,29 @@ def robinhood_init(ROBINHOOD_EXTERNAL=None, botObj=None, loop=None):
         index = RH.index(account) + 1
         name = f"Robinhood {index}"
         printAndDiscord(f"Logging in to {name}...", loop)
-        printAndDiscord(
-            f"{name}: Check phone app for verification prompt. You have ~60 seconds.",
-            loop,
-        )
         try:
             account = account.split(":")
-            rh.login(
+            totp_secret = (
+                account[2] if len(account) > 2 and account[2] != "NA" else None
+            )
+            if totp_secret is None:
+                printAndDiscord(
+                    f"{name}: Check phone app for verification prompt. You have ~60 seconds.",
+                    loop,
+                )
+            client = RobinhoodClient(name)
+            client.login(
                 username=account[0],
                 password=account[1],
+                mfa_code=get_2fa_code(totp_secret) if totp_secret else None,
                 store_session=True,
                 expiresIn=86400 * 30,  # 30 days
                 pickle_path="./creds/",
                 pickle_name=name,
             )
-            rh_obj.set_logged_in_object(name, rh)
+            rh_obj.set_logged_in_object(name, client)
             # Load all accounts
-            all_accounts = rh.account.load_account_profile(dataType="results")
+            all_accounts = client.load_account_profile(dataType="results")
             for a in all_accounts:
                 if a["account_number"] in all_account_numbers:
                     continue
@@ -78,32 +154,138 @@ def robinhood_init(ROBINHOOD_EXTERNAL=None, botObj=None, loop=None):
     return rh_obj
 
 
+def robinhood_account_holdings(rho: Brokerage, key: str, loop=None):
+    obj: RobinhoodClient = rho.get_logged_in_objects(key)
+    for account in rho.get_account_numbers(key):
+        try:
+            # Get account holdings
+            positions = obj.get_open_stock_positions(account_number=account)
+            if positions != []:
+                for item in positions:
+                    # Get symbol, quantity, price, and total value
+                    sym = item["symbol"] = obj.get_symbol_by_url(item["instrument"])
+                    qty = float(item["quantity"])
+                    try:
+                        current_price = round(float(obj.get_latest_price(sym)[0]), 2)
+                    except TypeError as e:
+                        if "NoneType" in str(e):
+                            current_price = "N/A"
+                    rho.set_holdings(key, account, sym, qty, current_price)
+        except Exception as e:
+            printAndDiscord(f"{key}: Error getting account holdings: {e}", loop)
+            print(traceback.format_exc())
+            continue
+
+
 def robinhood_holdings(rho: Brokerage, loop=None):
-    for key in rho.get_account_numbers():
-        for account in rho.get_account_numbers(key):
-            obj: rh = rho.get_logged_in_objects(key)
-            login_with_cache(pickle_path="./creds/", pickle_name=key)
+    # Each login has its own session, so fetch them all at once
+    threads = [
+        ThreadHandler(robinhood_account_holdings, rho, key, loop)
+        for key in rho.get_account_numbers()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    printHoldings(rho, loop)
+
+
+def get_bid_ask(obj: RobinhoodClient, s: str):
+    # Get ask and bid in one quote request
+    try:
+        quote = obj.get_quotes(s)[0]
+        return quote["ask_price"], quote["bid_price"]
+    except (TypeError, IndexError, KeyError) as e:
+        print(f"Error getting quote for {s}: {e}")
+        return None, None
+
+
+def robinhood_account_transaction(
+    rho: Brokerage,
+    key: str,
+    s: str,
+    orderObj: stockOrder,
+    bid_ask: tuple,
+    loop=None,
+):
+    printAndDiscord(
+        f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}",
+        loop,
+    )
+    obj: RobinhoodClient = rho.get_logged_in_objects(key)
+    for account in rho.get_account_numbers(key):
+        print_account = maskString(account)
+        if not orderObj.get_dry():
             try:
-                # Get account holdings
-                positions = obj.get_open_stock_positions(account_number=account)
-                if positions != []:
-                    for item in positions:
-                        # Get symbol, quantity, price, and total value
-                        sym = item["symbol"] = obj.get_symbol_by_url(item["instrument"])
-                        qty = float(item["quantity"])
-                        try:
-                            current_price = round(
-                                float(obj.stocks.get_latest_price(sym)[0]), 2
+                # Market order
+                market_order = obj.order(
+                    symbol=s,
+                    quantity=orderObj.get_amount(),
+                    side=orderObj.get_action(),
+                    account_number=account,
+                    timeInForce="gfd",
+                )
+                # Limit order fallback
+                if market_order is None:
+                    printAndDiscord(
+                        f"{key}: Error {orderObj.get_action()}ing {orderObj.get_amount()} of {s} in {print_account}, trying Limit Order",
+                        loop,
+                    )
+                    # Quote was fetched once for all accounts
+                    ask, bid = bid_ask
+                    if ask is not None and bid is not None:
+                        print(f"Ask: {ask}, Bid: {bid}")
+                        # Add or subtract 1 cent to ask or bid
+                        if orderObj.get_action() == "buy":
+                            price = (
+                                float(ask) if float(ask) > float(bid) else float(bid)
+                            )
+                            price = round(price + 0.01, 2)
+                        else:
+                            price = (
+                                float(ask) if float(ask) < float(bid) else float(bid)
                             )
-                        except TypeError as e:
-                            if "NoneType" in str(e):
-                                current_price = "N/A"
-                        rho.set_holdings(key, account, sym, qty, current_price)
+                            price = round(price - 0.01, 2)
+                    else:
+                        printAndDiscord(f"{key}: Error getting price for {s}", loop)
+                        continue
+                    limit_order = obj.order(
+                        symbol=s,
+                        quantity=orderObj.get_amount(),
+                        side=orderObj.get_action(),
+                        limitPrice=price,
+                        account_number=account,
+                        timeInForce="gfd",
+                    )
+                    if limit_order is None:
+                        printAndDiscord(
+                            f"{key}: Error {orderObj.get_action()}ing {orderObj.get_amount()} of {s} in {print_account}",
+                            loop,
+                        )
+                        continue
+                    message = "Success"
+                    if limit_order.get("non_field_errors") is not None:
+                        message = limit_order["non_field_errors"]
+                    printAndDiscord(
+                        f"{key}: {orderObj.get_action()} {orderObj.get_amount()} of {s} in {print_account} @ {price}: {message}",
+                        loop,
+                    )
+                else:
+                    message = "Success"
+                    if market_order.get("non_field_errors") is not None:
+                        message = market_order["non_field_errors"]
+                    printAndDiscord(
+                        f"{key}: {orderObj.get_action()} {orderObj.get_amount()} of {s} in {print_account}: {message}",
+                        loop,
+                    )
             except Exception as e:
-                printAndDiscord(f"{key}: Error getting account holdings: {e}", loop)
+                printAndDiscord(f"{key} Error submitting order: {e}", loop)
                 print(traceback.format_exc())
-                continue
-    printHoldings(rho, loop)
+        else:
+            printAndDiscord(
+                f"{key} {print_account} Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}",
+                loop,
+            )
 
 
 def robinhood_transaction(rho: Brokerage, orderObj: stockOrder, loop=None):
@@ -113,89 +295,21 @@ def robinhood_transaction(rho: Brokerage, orderObj: stockOrder, loop=None):
     print("==============================")
     print()
     for s in orderObj.get_stocks():
-        for key in rho.get_account_numbers():
-            printAndDiscord(
-                f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}",
-                loop,
+        keys = list(rho.get_account_numbers())
+        if len(keys) == 0:
+            continue
+        # Prefetch quote for limit order fallback
+        bid_ask = (None, None)
+        if not orderObj.get_dry():
+            bid_ask = get_bid_ask(rho.get_logged_in_objects(keys[0]), s)
+        # Each login has its own session, so place orders for all at once
+        threads = [
+            ThreadHandler(
+                robinhood_account_transaction, rho, key, s, orderObj, bid_ask, loop
             )
-            for account in rho.get_account_numbers(key):
-                obj: rh = rho.get_logged_in_objects(key)
-                login_with_cache(pickle_path="./creds/", pickle_name=key)
-                print_account = maskString(account)
-                if not orderObj.get_dry():
-                    try:
-                        # Market order
-                        market_order = obj.order(
-                            symbol=s,
-                            quantity=orderObj.get_amount(),
-                            side=orderObj.get_action(),
-                            account_number=account,
-                            timeInForce="gfd",
-                        )
-                        # Limit order fallback
-                        if market_order is None:
-                            printAndDiscord(
-                                f"{key}: Error {orderObj.get_action()}ing {orderObj.get_amount()} of {s} in {print_account}, trying Limit Order",
-                                loop,
-                            )
-                            ask = obj.get_latest_price(s, priceType="ask_price")[0]
-                            bid = obj.get_latest_price(s, priceType="bid_price")[0]
-                            if ask is not None and bid is not None:
-                                print(f"Ask: {ask}, Bid: {bid}")
-                                # Add or subtract 1 cent to ask or bid
-                                if orderObj.get_action() == "buy":
-                                    price = (
-                                        float(ask)
-                                        if float(ask) > float(bid)
-                                        else float(bid)
-                                    )
-                                    price = round(price + 0.01, 2)
-                                else:
-                                    price = (
-                                        float(ask)
-                                        if float(ask) < float(bid)
-                                        else float(bid)
-                                    )
-                                    price = round(price - 0.01, 2)
-                            else:
-                                printAndDiscord(
-                                    f"{key}: Error getting price for {s}", loop
-                                )
-                                continue
-                            limit_order = obj.order(
-                                symbol=s,
-                                quantity=orderObj.get_amount(),
-                                side=orderObj.get_action(),
-                                limitPrice=price,
-                                account_number=account,
-                                timeInForce="gfd",
-                            )
-                            if limit_order is None:
-                                printAndDiscord(
-                                    f"{key}: Error {orderObj.get_action()}ing {orderObj.get_amount()} of {s} in {print_account}",
-                                    loop,
-                                )
-                                continue
-                            message = "Success"
-                            if limit_order.get("non_field_errors") is not None:
-                                message = limit_order["non_field_errors"]
-                            printAndDiscord(
-                                f"{key}: {orderObj.get_action()} {orderObj.get_amount()} of {s} in {print_account} @ {price}: {message}",
-                                loop,
-                            )
-                        else:
-                            message = "Success"
-                            if market_order.get("non_field_errors") is not None:
-                                message = market_order["non_field_errors"]
-                            printAndDiscord(
-                                f"{key}: {orderObj.get_action()} {orderObj.get_amount()} of {s} in {print_account}: {message}",
-                                loop,
-                            )
-                    except Exception as e:
-                        printAndDiscord(f"{key} Error submitting order: {e}", loop)
-                        print(traceback.format_exc())
-                else:
-                    printAndDiscord(
-                        f"{key} {print_account} Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}",
-                        loop,
-                    )
+            for key in keys
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
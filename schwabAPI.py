@@ -3,12 +3,46 @@
 
 import os
 import traceback
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from time import time
 
 from dotenv import load_dotenv
 from schwab_api import Schwab
 
-from helperAPI import Brokerage, maskString, printAndDiscord, printHoldings, stockOrder
+from helperAPI import (
+    Brokerage,
+    RateLimiter,
+    maskString,
+    printAndDiscord,
+    printHoldings,
+    stockOrder,
+)
+
+# Max age in seconds of the login account snapshot before holdings refetches it
+SCHWAB_SNAPSHOT_MAX_AGE = float(os.getenv("SCHWAB_SNAPSHOT_MAX_AGE", "60"))
+SCHWAB_MAX_WORKERS = 4  # Orders in flight at once per session
+# Order submissions allowed per second across all Schwab sessions
+# (a conservative default, not a measured Schwab limit)
+SCHWAB_RATE_LIMITER = RateLimiter(float(os.getenv("SCHWAB_ORDERS_PER_SECOND", "2")))
+
+
+def lock_token_refresh(schwab: Schwab):
+    """
+    Serialize token refreshes on one Schwab session
+
+    trade_v2 refreshes the token on every call, which rewrites the session
+    cache file and may log in again. Legs of one session run in parallel,
+    so only one thread at a time may do that.
+    """
+    lock = Lock()
+    update_token = schwab.update_token
+
+    def locked_update_token(*args, **kwargs):
+        with lock:
+            return update_token(*args, **kwargs)
+
+    schwab.update_token = locked_update_token
 
 
 def schwab_init(SCHWAB_EXTERNAL=None):
@@ -42,7 +76,11 @@ def schwab_init(SCHWAB_EXTERNAL=None):
             print_accounts = [maskString(a) for a in account_list]
             print(f"The following Schwab accounts were found: {print_accounts}")
             print("Logged in to Schwab!")
-            schwab_obj.set_logged_in_object(name, schwab)
+            lock_token_refresh(schwab)
+            schwab_obj.set_logged_in_object(name, schwab, "schwab")
+            # Keep snapshot so holdings doesn't have to fetch it again
+            schwab_obj.set_logged_in_object(name, account_info, "account_info")
+            schwab_obj.set_logged_in_object(name, time(), "account_info_time")
             for account in account_list:
                 schwab_obj.set_account_number(name, account)
                 schwab_obj.set_account_totals(
@@ -58,8 +96,12 @@ def schwab_init(SCHWAB_EXTERNAL=None):
 def schwab_holdings(schwab_o: Brokerage, loop=None):
     # Get holdings on each account
     for key in schwab_o.get_account_numbers():
-        obj: Schwab = schwab_o.get_logged_in_objects(key)
-        all_holdings = obj.get_account_info_v2()
+        obj: Schwab = schwab_o.get_logged_in_objects(key, "schwab")
+        snapshot_age = time() - schwab_o.get_logged_in_objects(key, "account_info_time")
+        if snapshot_age < SCHWAB_SNAPSHOT_MAX_AGE:
+            all_holdings = schwab_o.get_logged_in_objects(key, "account_info")
+        else:
+            all_holdings = obj.get_account_info_v2()
         for account in schwab_o.get_account_numbers(key):
             try:
                 holdings = all_holdings[account]["positions"]
@@ -81,6 +123,38 @@ def schwab_holdings(schwab_o: Brokerage, loop=None):
     printHoldings(schwab_o, loop)
 
 
+def schwab_order(obj: Schwab, s: str, account: str, orderObj: stockOrder, v2=True):
+    # Wait for our turn so we stay under Schwab's rate limit
+    SCHWAB_RATE_LIMITER.wait()
+    trade = obj.trade_v2 if v2 else obj.trade
+    return trade(
+        ticker=s,
+        side=orderObj.get_action().capitalize(),
+        qty=orderObj.get_amount(),
+        account_id=account,
+        dry_run=orderObj.get_dry(),
+    )
+
+
+def schwab_submit_orders(
+    obj: Schwab, s: str, accounts: list, orderObj: stockOrder, v2=True
+) -> dict:
+    # Submit all legs at once, returns account -> (messages, success) or exception
+    results = {}
+    with ThreadPoolExecutor(max_workers=SCHWAB_MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(schwab_order, obj, s, account, orderObj, v2): account
+            for account in accounts
+        }
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                print(traceback.format_exc())
+                results[futures[future]] = e
+    return results
+
+
 def schwab_transaction(schwab_o: Brokerage, orderObj: stockOrder, loop=None):
     print()
     print("==============================")
@@ -89,70 +163,69 @@ def schwab_transaction(schwab_o: Brokerage, orderObj: stockOrder, loop=None):
     print()
     # Use each account (unless specified in .env)
     purchase_accounts = os.getenv("SCHWAB_ACCOUNT_NUMBERS", "").strip().split(":")
+    # If DRY is True, don't actually make the transaction
+    if orderObj.get_dry():
+        printAndDiscord("Running in DRY mode. No transactions will be made.", loop)
     for s in orderObj.get_stocks():
         for key in schwab_o.get_account_numbers():
             printAndDiscord(
                 f"{key} {orderObj.get_action()}ing {orderObj.get_amount()} {s} @ {orderObj.get_price()}",
                 loop,
             )
-            obj: Schwab = schwab_o.get_logged_in_objects(key)
+            obj: Schwab = schwab_o.get_logged_in_objects(key, "schwab")
+            accounts = []
             for account in schwab_o.get_account_numbers(key):
-                print_account = maskString(account)
                 if (
                     purchase_accounts != [""]
                     and orderObj.get_action().lower() != "sell"
                     and str(account) not in purchase_accounts
                 ):
                     print(
-                        f"Skipping account {print_account}, not in SCHWAB_ACCOUNT_NUMBERS"
+                        f"Skipping account {maskString(account)}, not in SCHWAB_ACCOUNT_NUMBERS"
                     )
                     continue
-                # If DRY is True, don't actually make the transaction
-                if orderObj.get_dry():
-                    printAndDiscord(
-                        "Running in DRY mode. No transactions will be made.", loop
-                    )
-                try:
-                    messages, success = obj.trade_v2(
-                        ticker=s,
-                        side=orderObj.get_action().capitalize(),
-                        qty=orderObj.get_amount(),
-                        account_id=account,
-                        dry_run=orderObj.get_dry(),
-                    )
+                accounts.append(account)
+            # Try every leg with trade_v2
+            retry_accounts = []
+            results = schwab_submit_orders(obj, s, accounts, orderObj)
+            for account in accounts:
+                print_account = maskString(account)
+                result = results[account]
+                if isinstance(result, Exception):
                     printAndDiscord(
-                        (
-                            f"{key} account {print_account}: The order verification was "
-                            + "successful"
-                            if success
-                            else "unsuccessful, retrying..."
-                        ),
+                        f"{key} {print_account}: Error submitting order: {result}, retrying...",
                         loop,
                     )
-                    if not success:
-                        messages, success = obj.trade(
-                            ticker=s,
-                            side=orderObj.get_action().capitalize(),
-                            qty=orderObj.get_amount(),
-                            account_id=account,
-                            dry_run=orderObj.get_dry(),
-                        )
-                        printAndDiscord(
-                            (
-                                f"{key} account {print_account}: The order verification was "
-                                + "retry successful"
-                                if success
-                                else "retry unsuccessful"
-                            ),
-                            loop,
-                        )
-                        printAndDiscord(
-                            f"{key} account {print_account}: The order verification produced the following messages: {messages}",
-                            loop,
-                        )
-                except Exception as e:
+                    retry_accounts.append(account)
+                    continue
+                _, success = result
+                printAndDiscord(
+                    f"{key} account {print_account}: The order verification was "
+                    + ("successful" if success else "unsuccessful, retrying..."),
+                    loop,
+                )
+                if not success:
+                    retry_accounts.append(account)
+            if len(retry_accounts) == 0:
+                continue
+            # Only retry failed legs with the old trade method
+            results = schwab_submit_orders(obj, s, retry_accounts, orderObj, v2=False)
+            for account in retry_accounts:
+                print_account = maskString(account)
+                result = results[account]
+                if isinstance(result, Exception):
                     printAndDiscord(
-                        f"{key} {print_account}: Error submitting order: {e}", loop
+                        f"{key} {print_account}: Error submitting order: {result}",
+                        loop,
                     )
-                    print(traceback.format_exc())
-                sleep(1)
+                    continue
+                messages, success = result
+                printAndDiscord(
+                    f"{key} account {print_account}: The order verification was "
+                    + ("retry successful" if success else "retry unsuccessful"),
+                    loop,
+                )
+                printAndDiscord(
+                    f"{key} account {print_account}: The order verification produced the following messages: {messages}",
+                    loop,
+                )
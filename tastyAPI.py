@@ -3,6 +3,7 @@
 
 import asyncio
 import os
+import threading
 import traceback
 from decimal import Decimal as D
 
@@ -13,13 +14,32 @@ from tastytrade.dxfeed import Profile, Quote
 from tastytrade.instruments import Equity
 from tastytrade.order import NewOrder, OrderAction, OrderTimeInForce, OrderType
 from tastytrade.streamer import DXLinkStreamer
-from tastytrade.utils import TastytradeError
 
 from helperAPI import Brokerage, maskString, printAndDiscord, printHoldings, stockOrder
 
+# Sessions keep async HTTP clients bound to the loop they first ran on,
+# so every Tastytrade coroutine runs on the same event loop
+TASTY_LOOP = asyncio.new_event_loop()
+TASTY_LOOP_LOCK = threading.Lock()
+MAX_CONCURRENT_ORDERS = 5  # Orders in flight at once across all accounts
 
-def order_setup(tt: Session, order_type, stock_price, stock, amount):
-    symbol = Equity.get_equity(tt, stock)
+
+def run_async(coro):
+    with TASTY_LOOP_LOCK:
+        return TASTY_LOOP.run_until_complete(coro)
+
+
+async def get_equity(tt: Session, stock: str, equity_cache: dict) -> Equity:
+    # Instrument definitions are the same for every session
+    if stock not in equity_cache:
+        equity_cache[stock] = await Equity.a_get_equity(tt, stock)
+    return equity_cache[stock]
+
+
+async def order_setup(
+    tt: Session, order_type, stock_price, stock, amount, equity_cache
+):
+    symbol = await get_equity(tt, stock, equity_cache)
     if order_type[2] == "Buy to Open":
         leg = symbol.build_leg(D(amount), OrderAction.BUY_TO_OPEN)
     elif order_type[2] == "Sell to Close":
@@ -35,6 +55,20 @@ def order_setup(tt: Session, order_type, stock_price, stock, amount):
     return new_order
 
 
+async def tastytrade_load_accounts(tasty: Session):
+    an = await Account.a_get_accounts(tasty)
+    balances = await asyncio.gather(*[acct.a_get_balances(tasty) for acct in an])
+    return an, balances
+
+
+async def tastytrade_load_all_accounts(sessions: dict):
+    # Load accounts and balances for every login at the same time
+    results = await asyncio.gather(
+        *[tastytrade_load_accounts(tasty) for tasty in sessions.values()]
+    )
+    return dict(zip(sessions.keys(), results))
+
+
 def tastytrade_init(TASTYTRADE_EXTERNAL=None):
     # Initialize .env file
     load_dotenv()
@@ -50,6 +84,7 @@ def tastytrade_init(TASTYTRADE_EXTERNAL=None):
     tasty_obj = Brokerage("Tastytrade")
     # Log in to Tastytrade account
     print("Logging in to Tastytrade...")
+    sessions = {}
     for account in accounts:
         index = accounts.index(account) + 1
         account = account.strip().split(":")
@@ -57,142 +92,288 @@ def tastytrade_init(TASTYTRADE_EXTERNAL=None):
         try:
             tasty = Session(account[0], account[1])
             tasty_obj.set_logged_in_object(name, tasty, "session")
-            an = Account.get_accounts(tasty)
-            tasty_obj.set_logged_in_object(name, an, "accounts")
-            for acct in an:
-                tasty_obj.set_account_number(name, acct.account_number)
-                tasty_obj.set_account_totals(
-                    name, acct.account_number, acct.get_balances(tasty).cash_balance
-                )
+            sessions[name] = tasty
             print("Logged in to Tastytrade!")
         except Exception as e:
             traceback.print_exc()
             print(f"Error logging in to {name}: {e}")
             return None
+    try:
+        all_accounts = run_async(tastytrade_load_all_accounts(sessions))
+    except Exception as e:
+        traceback.print_exc()
+        print(f"Error loading Tastytrade accounts: {e}")
+        return None
+    for name, (an, balances) in all_accounts.items():
+        tasty_obj.set_logged_in_object(name, an, "accounts")
+        for acct, balance in zip(an, balances):
+            tasty_obj.set_account_number(name, acct.account_number)
+            tasty_obj.set_account_totals(
+                name, acct.account_number, balance.cash_balance
+            )
     return tasty_obj
 
 
+async def tastytrade_get_positions(tt_o: Brokerage, key: str, loop=None):
+    obj: Session = tt_o.get_logged_in_objects(key, "session")
+    accounts: list = tt_o.get_logged_in_objects(key, "accounts")
+    results = await asyncio.gather(
+        *[account.a_get_positions(obj) for account in accounts],
+        return_exceptions=True,
+    )
+    for index, positions in enumerate(results):
+        if isinstance(positions, Exception):
+            printAndDiscord(f"{key}: Error getting account holdings: {positions}", loop)
+            traceback.print_exception(positions)
+            continue
+        an = tt_o.get_account_numbers(key)[index]
+        for pos in positions:
+            tt_o.set_holdings(
+                key,
+                an,
+                pos.symbol,
+                pos.quantity,
+                pos.average_daily_market_close_price,
+            )
+
+
+async def tastytrade_get_all_positions(tt_o: Brokerage, loop=None):
+    await asyncio.gather(
+        *[
+            tastytrade_get_positions(tt_o, key, loop)
+            for key in tt_o.get_account_numbers()
+        ]
+    )
+
+
 def tastytrade_holdings(tt_o: Brokerage, loop=None):
-    for key in tt_o.get_account_numbers():
-        obj: Session = tt_o.get_logged_in_objects(key, "session")
-        for index, account in enumerate(tt_o.get_logged_in_objects(key, "accounts")):
-            try:
-                an = tt_o.get_account_numbers(key)[index]
-                positions = account.get_positions(obj)
-                for pos in positions:
-                    tt_o.set_holdings(
-                        key,
-                        an,
-                        pos.symbol,
-                        pos.quantity,
-                        pos.average_daily_market_close_price,
-                    )
-            except Exception as e:
-                printAndDiscord(f"{key}: Error getting account holdings: {e}", loop)
-                print(traceback.format_exc())
-                continue
+    run_async(tastytrade_get_all_positions(tt_o, loop))
     printHoldings(tt_o, loop=loop)
 
 
+class QuoteStreamer:
+    """
+    One DXLink streamer per session, opened on first use and subscribed to
+    every ticker in the order. Profile and Quote events are kept in a small
+    cache so limit order retries don't have to wait on a new connection.
+    """
+
+    def __init__(self, tt: Session, symbols: list, timeout: float = 10):
+        self.session = tt
+        self.symbols = symbols
+        self.timeout = timeout
+        self.streamer: DXLinkStreamer = None
+        self.events = {Profile: {}, Quote: {}}
+        self.received = {Profile: {}, Quote: {}}
+        self.tasks = []
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        async with self.lock:
+            if self.streamer is not None:
+                return
+            for event_type in self.events:
+                for symbol in self.symbols:
+                    self.received[event_type][symbol] = asyncio.Event()
+            self.streamer = await DXLinkStreamer(self.session)
+            for event_type in self.events:
+                await self.streamer.subscribe(event_type, self.symbols)
+                self.tasks.append(asyncio.create_task(self.listen(event_type)))
+
+    async def listen(self, event_type):
+        while True:
+            event = await self.streamer.get_event(event_type)
+            self.events[event_type][event.event_symbol] = event
+            if event.event_symbol in self.received[event_type]:
+                self.received[event_type][event.event_symbol].set()
+
+    async def get_event(self, event_type, symbol):
+        await self.open()
+        await asyncio.wait_for(
+            self.received[event_type][symbol].wait(), timeout=self.timeout
+        )
+        return self.events[event_type][symbol]
+
+    async def get_limit_price(self, symbol: str, action: str) -> D:
+        stock_limit = await self.get_event(Profile, symbol)
+        stock_quote = await self.get_event(Quote, symbol)
+        # Missing limit prices come through as None
+        if action == "buy":
+            stock_limit = stock_limit.high_limit_price
+            return D(stock_quote.ask_price) if stock_limit is None else D(stock_limit)
+        stock_limit = stock_limit.low_limit_price
+        return D(stock_quote.bid_price) if stock_limit is None else D(stock_limit)
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.streamer is not None:
+            await self.streamer.close()
+            self.streamer = None
+
+
 async def tastytrade_execute(tt_o: Brokerage, orderObj: stockOrder, loop=None):
     print()
     print("==============================")
     print("Tastytrade")
     print("==============================")
     print()
+    # Fetch each ticker's instrument once per run
+    equity_cache = {}
+    # Quote streamers are only opened if an order needs a limit retry
+    streamers = {
+        key: QuoteStreamer(
+            tt_o.get_logged_in_objects(key, "session"), orderObj.get_stocks()
+        )
+        for key in tt_o.get_account_numbers()
+    }
+    try:
+        await tastytrade_place_all_orders(tt_o, orderObj, equity_cache, streamers, loop)
+    finally:
+        await asyncio.gather(
+            *[streamer.close() for streamer in streamers.values()],
+            return_exceptions=True,
+        )
+
+
+async def tastytrade_place_order(
+    obj: Session,
+    acct: Account,
+    s: str,
+    orderObj: stockOrder,
+    equity_cache: dict,
+    streamer: QuoteStreamer,
+    semaphore: asyncio.Semaphore,
+) -> str:
+    print_account = maskString(acct.account_number)
+    async with semaphore:
+        try:
+            # Set order type
+            if orderObj.get_action() == "buy":
+                order_type = ["Market", "Debit", "Buy to Open"]
+            else:
+                order_type = ["Market", "Credit", "Sell to Close"]
+            # Set stock price
+            stock_price = 0
+            # Skip day trade check for now
+            # Place order
+            new_order = await order_setup(
+                obj, order_type, stock_price, s, orderObj.get_amount(), equity_cache
+            )
+            try:
+                placed_order = await acct.a_place_order(
+                    obj, new_order, dry_run=orderObj.get_dry()
+                )
+                order_status = placed_order.order.status.value
+            except Exception as e:
+                return f"{print_account}: Error placing order: {e}"
+            # Retry with limit order
+            if order_status == "Rejected":
+                print(f"{print_account} Error: {order_status} Trying Limit order...")
+                stock_price = await streamer.get_limit_price(s, orderObj.get_action())
+                print(f"{s} limit price is: ${round(stock_price, 2)}")
+                new_order = await order_setup(
+                    obj,
+                    order_type,
+                    stock_price,
+                    s,
+                    orderObj.get_amount(),
+                    equity_cache,
+                )
+                placed_order = await acct.a_place_order(
+                    obj, new_order, dry_run=orderObj.get_dry()
+                )
+                order_status = placed_order.order.status.value
+            # Check order status
+            if order_status in ["Received", "Routed"]:
+                if orderObj.get_dry():
+                    return f"{print_account}: Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}"
+                return f"{print_account}: {orderObj.get_action()} {orderObj.get_amount()} of {s} Order: {placed_order.order.id} Status: {order_status}"
+            # Only want this message if it fails both orders.
+            return f"{print_account}: Error placing order: {placed_order.order.id}: {order_status}"
+        except Exception as e:
+            # Report the error on this account without cancelling the others
+            print(traceback.format_exc())
+            return f"{print_account}: Error: {e}"
+
+
+async def tastytrade_place_orders(
+    tt_o: Brokerage,
+    key: str,
+    s: str,
+    orderObj: stockOrder,
+    equity_cache: dict,
+    streamer: QuoteStreamer,
+    semaphore: asyncio.Semaphore,
+    loop=None,
+):
+    obj: Session = tt_o.get_logged_in_objects(key, "session")
+    accounts: list = tt_o.get_logged_in_objects(key, "accounts")
+    results = await asyncio.gather(
+        *[
+            tastytrade_place_order(
+                obj, acct, s, orderObj, equity_cache, streamer, semaphore
+            )
+            for acct in accounts
+        ],
+        return_exceptions=True,
+    )
+    results = [
+        (
+            f"{maskString(acct.account_number)}: Error: {result}"
+            if isinstance(result, BaseException)
+            else result
+        )
+        for acct, result in zip(accounts, results)
+    ]
+    # One message per login
+    printAndDiscord(
+        f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}\n"
+        + "\n".join(results),
+        loop=loop,
+    )
+
+
+async def tastytrade_place_all_orders(
+    tt_o: Brokerage, orderObj: stockOrder, equity_cache, streamers, loop=None
+):
+    # Limit how many orders are in flight at once
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_ORDERS)
     for s in orderObj.get_stocks():
-        for key in tt_o.get_account_numbers():
-            obj: Session = tt_o.get_logged_in_objects(key, "session")
-            accounts: Account = tt_o.get_logged_in_objects(key, "accounts")
-            printAndDiscord(
-                f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}",
-                loop=loop,
+        keys = list(tt_o.get_account_numbers())
+        if len(keys) == 0:
+            continue
+        # Fetch instrument before orders go out at the same time
+        try:
+            await get_equity(
+                tt_o.get_logged_in_objects(keys[0], "session"), s, equity_cache
             )
-            for i, acct in enumerate(tt_o.get_account_numbers(key)):
-                print_account = maskString(acct)
-                try:
-                    acct: Account = accounts[i]
-                    # Set order type
-                    if orderObj.get_action() == "buy":
-                        order_type = ["Market", "Debit", "Buy to Open"]
-                    else:
-                        order_type = ["Market", "Credit", "Sell to Close"]
-                    # Set stock price
-                    stock_price = 0
-                    # Skip day trade check for now
-                    # Place order
-                    new_order = order_setup(
-                        obj, order_type, stock_price, s, orderObj.get_amount()
-                    )
-                    try:
-                        placed_order = acct.place_order(
-                            obj, new_order, dry_run=orderObj.get_dry()
-                        )
-                        order_status = placed_order.order.status.value
-                    except Exception as e:
-                        printAndDiscord(
-                            f"{key} {print_account}: Error placing order: {e}",
-                            loop=loop,
-                        )
-                        continue
-                    # Check order status
-                    if order_status in ["Received", "Routed"]:
-                        message = f"{key} {print_account}: {orderObj.get_action()} {orderObj.get_amount()} of {s} Order: {placed_order.order.id} Status: {order_status}"
-                        if orderObj.get_dry():
-                            message = f"{key} Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}"
-                        printAndDiscord(message, loop=loop)
-                    elif order_status == "Rejected":
-                        # Retry with limit order
-                        streamer = await DXLinkStreamer.create(obj)
-                        stock_limit = await streamer.subscribe(Profile, [s])
-                        stock_quote = await streamer.subscribe(Quote, [s])
-                        stock_limit = await streamer.get_event(Profile)
-                        stock_quote = await streamer.get_event(Quote)
-                        printAndDiscord(
-                            f"{key} {print_account} Error: {order_status} Trying Limit order...",
-                            loop=loop,
-                        )
-                        # Get limit price
-                        if orderObj.get_action() == "buy":
-                            stock_limit = D(stock_limit.highLimitPrice)
-                            stock_price = (
-                                D(stock_quote.askPrice)
-                                if stock_limit.is_nan()
-                                else stock_limit
-                            )
-                            order_type = ["Market", "Debit", "Buy to Open"]
-                        elif orderObj.get_action() == "sell":
-                            stock_limit = D(stock_limit.lowLimitPrice)
-                            stock_price = (
-                                D(stock_quote.bidPrice)
-                                if stock_limit.is_nan()
-                                else stock_limit
-                            )
-                            order_type = ["Market", "Credit", "Sell to Close"]
-                        print(f"{s} limit price is: ${round(stock_price, 2)}")
-                        # Retry order
-                        new_order = order_setup(
-                            obj, order_type, stock_price, s, orderObj.get_amount()
-                        )
-                        placed_order = acct.place_order(
-                            obj, new_order, dry_run=orderObj.get_dry()
-                        )
-                        # Check order status
-                        if order_status in ["Received", "Routed"]:
-                            message = f"{key} {print_account}: {orderObj.get_action()} {orderObj.get_amount()} of {s} Order: {placed_order.order.id} Status: {order_status}"
-                            if orderObj.get_dry():
-                                message = f"{key} Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}"
-                            printAndDiscord(message, loop=loop)
-                        elif order_status == "Rejected":
-                            # Only want this message if it fails both orders.
-                            printAndDiscord(
-                                f"{key} Error placing order: {placed_order.order.id} on account {print_account}: {order_status}",
-                                loop=loop,
-                            )
-                except (TastytradeError, KeyError) as te:
-                    printAndDiscord(f"{key} {print_account}: Error: {te}", loop=loop)
-                    continue
+        except Exception as e:
+            printAndDiscord(f"Tastytrade: Error getting {s}: {e}", loop=loop)
+            continue
+        results = await asyncio.gather(
+            *[
+                tastytrade_place_orders(
+                    tt_o,
+                    key,
+                    s,
+                    orderObj,
+                    equity_cache,
+                    streamers[key],
+                    semaphore,
+                    loop,
+                )
+                for key in keys
+            ],
+            return_exceptions=True,
+        )
+        # Keep going with the next ticker if a login failed to report
+        for key, result in zip(keys, results):
+            if isinstance(result, BaseException):
+                printAndDiscord(f"{key}: Error placing {s} orders: {result}", loop=loop)
 
 
 def tastytrade_transaction(tt: Brokerage, orderObj: stockOrder, loop=None):
-    asyncio.run(tastytrade_execute(tt_o=tt, orderObj=orderObj, loop=loop))
+    run_async(tastytrade_execute(tt_o=tt, orderObj=orderObj, loop=loop))
@@ -1,26 +1,40 @@
 # Nelson Dane
 # Webull API
 
+import json
 import os
 import traceback
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from time import sleep, time
 
+import requests
 from dotenv import load_dotenv
 from webull import webull
 
 from helperAPI import Brokerage, maskString, printAndDiscord, printHoldings, stockOrder
 
 MAX_WB_RETRIES = 3  # Number of times to retry logging in if not successful
+WB_RETRY_BACKOFF = 2  # Seconds to wait before first login retry, doubles each time
 MAX_WB_ACCOUNTS = 11  # Different account types
+QUOTE_TTL = 5  # Seconds to reuse a quote
+QUOTE_CACHE = {}  # Symbol -> (time fetched, quote)
 
 
-def place_order(obj: webull, account: str, orderObj: stockOrder, s: str):
-    obj.set_account_id(account)
+def account_view(obj: webull, internal_account: str) -> webull:
+    # Shallow copy shares the login session and tokens, but has
+    # its own account ID so accounts can be used at the same time
+    view = copy(obj)
+    view.set_account_id(internal_account)
+    return view
+
+
+def place_order(obj: webull, orderObj: stockOrder, s: str, action: str, amount):
     order = obj.place_order(
         stock=s,
-        action=orderObj.get_action().upper(),
+        action=action.upper(),
         orderType=orderObj.get_price().upper(),
-        quant=orderObj.get_amount(),
+        quant=amount,
         enforce=orderObj.get_time().upper(),
     )
     if order.get("success") is not None and not order["success"]:
@@ -29,6 +43,51 @@ def place_order(obj: webull, account: str, orderObj: stockOrder, s: str):
     return True
 
 
+def get_account_list(obj: webull) -> list:
+    # One request for every account instead of probing get_account_id(i)
+    response = requests.get(
+        obj._urls.account_id(), headers=obj.build_req_headers(), timeout=obj.timeout
+    )
+    result = response.json()
+    if not result.get("success") or not result.get("data"):
+        return []
+    return [
+        {"secAccountId": str(a["secAccountId"]), "rzone": str(a["rzone"])}
+        for a in result["data"][:MAX_WB_ACCOUNTS]
+    ]
+
+
+def load_account_map(path: str) -> list:
+    # Display account number -> internal ID mapping saved at last login
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading Webull account map: {e}")
+        return []
+
+
+def save_account_map(path: str, account_map: list):
+    try:
+        with open(path, "w") as f:
+            json.dump(account_map, f)
+    except Exception as e:
+        print(f"Error saving Webull account map: {e}")
+
+
+def get_account_summaries(wb: webull, account_list: list) -> list:
+    # Webull uses a different internal account ID than displayed in app
+    def get_summary(item):
+        view = account_view(wb, item["secAccountId"])
+        view.zone_var = item["rzone"]
+        return view, view.get_account(v2=True)["accountSummaryVO"]
+
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(get_summary, account_list))
+
+
 # Initialize Webull
 def webull_init(WEBULL_EXTERNAL=None):
     # Initialize .env file
@@ -57,32 +116,41 @@ def webull_init(WEBULL_EXTERNAL=None):
                 wb = webull()
                 wb.set_did(account[2])
                 wb.login(account[0], account[1])
-                wb.get_trade_token(account[3])
-                id_test = wb.get_account_id(0)
-                if id_test is not None:
+                if wb.get_trade_token(account[3]):
                     break
                 if i == MAX_WB_RETRIES - 1:
                     raise Exception(
                         f"Unable to log in to {name} after {i+1} tries. Check credentials."
                     )
+                # Back off before trying again
+                sleep(WB_RETRY_BACKOFF * 2**i)
             wb_obj.set_logged_in_object(name, wb, "wb")
             wb_obj.set_logged_in_object(name, account[3], "trading_pin")
-            # Get all accounts
-            for i in range(MAX_WB_ACCOUNTS):
-                id = wb.get_account_id(i)
-                if id is None:
-                    break
-                # Webull uses a different internal account ID than displayed in app
-                ac = wb.get_account(v2=True)["accountSummaryVO"]
+            # Get all accounts from one list request, falling back
+            # to the mapping saved from the last successful login
+            map_path = f"./creds/webull{index + 1}_accounts.json"
+            try:
+                account_list = get_account_list(wb)
+            except Exception as e:
+                print(f"{name}: Error getting account list: {e}")
+                account_list = []
+            if account_list == []:
+                account_list = load_account_map(map_path)
+            if account_list == []:
+                raise Exception(f"No accounts found for {name}")
+            summaries = get_account_summaries(wb, account_list)
+            for item, (view, ac) in zip(account_list, summaries):
+                item["accountNumber"] = ac["accountNumber"]
                 wb_obj.set_account_number(name, ac["accountNumber"])
                 print(maskString(ac["accountNumber"]))
-                wb_obj.set_logged_in_object(name, id, ac["accountNumber"])
+                wb_obj.set_logged_in_object(name, view, ac["accountNumber"])
                 wb_obj.set_account_type(
                     name, ac["accountNumber"], ac["accountTypeName"]
                 )
                 wb_obj.set_account_totals(
                     name, ac["accountNumber"], ac["netLiquidationValue"]
                 )
+            save_account_map(map_path, account_list)
         except Exception as e:
             print(traceback.format_exc())
             print(f"Error: Unable to log in to Webull: {e}")
@@ -91,128 +159,153 @@ def webull_init(WEBULL_EXTERNAL=None):
     return wb_obj
 
 
+def webull_account_holdings(wbo: Brokerage, key: str, account: str, loop=None):
+    obj: webull = wbo.get_logged_in_objects(key, account)
+    try:
+        # Get account holdings
+        positions = obj.get_positions()
+        if positions is None:
+            positions = obj.get_positions(v2=True)
+        # List of holdings dictionaries
+        if positions is not None and positions != []:
+            for item in positions:
+                if item.get("items") is not None:
+                    item = item["items"][0]
+                sym = item["ticker"]["symbol"]
+                if sym == "":
+                    sym = "Unknown"
+                if item.get("quantity") is not None:
+                    qty = item["quantity"]
+                else:
+                    qty = item["position"]
+                if float(qty) == 0:
+                    continue
+                mv = round(float(item["marketValue"]) / float(qty), 2)
+                wbo.set_holdings(key, account, sym, qty, mv)
+    except Exception as e:
+        printAndDiscord(f"{key}: Error getting holdings: {e}", loop)
+        traceback.print_exc()
+
+
 def webull_holdings(wbo: Brokerage, loop=None):
-    for key in wbo.get_account_numbers():
-        for account in wbo.get_account_numbers(key):
-            obj: webull = wbo.get_logged_in_objects(key, "wb")
-            internal_account = wbo.get_logged_in_objects(key, account)
-            try:
-                # Get account holdings
-                obj.set_account_id(internal_account)
-                positions = obj.get_positions()
-                if positions is None:
-                    positions = obj.get_positions(v2=True)
-                # List of holdings dictionaries
-                if positions is not None and positions != []:
-                    for item in positions:
-                        if item.get("items") is not None:
-                            item = item["items"][0]
-                        sym = item["ticker"]["symbol"]
-                        if sym == "":
-                            sym = "Unknown"
-                        if item.get("quantity") is not None:
-                            qty = item["quantity"]
-                        else:
-                            qty = item["position"]
-                        if float(qty) == 0:
-                            continue
-                        mv = round(float(item["marketValue"]) / float(qty), 2)
-                        wbo.set_holdings(key, account, sym, qty, mv)
-            except Exception as e:
-                printAndDiscord(f"{key}: Error getting holdings: {e}", loop)
-                traceback.print_exc()
-                continue
+    # Each account has its own client view, so fetch them all at once
+    with ThreadPoolExecutor() as executor:
+        for key in wbo.get_account_numbers():
+            for account in wbo.get_account_numbers(key):
+                executor.submit(webull_account_holdings, wbo, key, account, loop)
     printHoldings(wbo, loop=loop)
 
 
+def get_quote(obj: webull, s: str) -> dict:
+    # Quotes are the same for every account, so cache them briefly
+    cached = QUOTE_CACHE.get(s)
+    if cached is not None and time() - cached[0] < QUOTE_TTL:
+        return cached[1]
+    quote = obj.get_quote(s)
+    QUOTE_CACHE[s] = (time(), quote)
+    return quote
+
+
+def get_dance_amount(obj: webull, s: str, amount: float):
+    # If buy stock price < $1 or $0.10,
+    # buy 100/1000 shares and sell 100/1000 - amount
+    quote = get_quote(obj, s)
+    askList = quote.get("askList", [])
+    bidList = quote.get("bidList", [])
+    if askList == [] and bidList == []:
+        raise Exception(f"{s} is not available for trading")
+    askPrice = float(askList[0]["price"]) if askList != [] else 0
+    bidPrice = float(bidList[0]["price"]) if bidList != [] else 0
+    # Dance if:
+    # amount < 100 and price < $1
+    # amount < 1000 and price < $0.10
+    if ((askPrice < 1 or bidPrice < 1) and amount < 100) or (
+        (askPrice < 0.1 or bidPrice < 0.1) and amount < 1000
+    ):
+        # 100 shares if < $1, 1000 shares if < $0.10
+        return 1000 if (askPrice < 0.1 or bidPrice < 0.1) else 100
+    return None
+
+
+def webull_account_transaction(
+    wbo: Brokerage,
+    key: str,
+    account: str,
+    orderObj: stockOrder,
+    s: str,
+    big_amount,
+    loop=None,
+):
+    print_account = maskString(account)
+    obj: webull = wbo.get_logged_in_objects(key, account)
+    if orderObj.get_dry():
+        printAndDiscord(
+            f"{key} {print_account}: Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}",
+            loop,
+        )
+        return
+    amount = orderObj.get_amount()
+    action = orderObj.get_action()
+    try:
+        if big_amount is not None and action == "buy":
+            print(f"Buying {big_amount} then selling {big_amount - amount} of {s}")
+            buy_success = place_order(obj, orderObj, s, "buy", big_amount)
+            if not buy_success:
+                raise Exception(f"Error buying {big_amount} of {s}")
+            amount = big_amount - amount
+            action = "sell"
+            sleep(1)
+            order = place_order(obj, orderObj, s, action, amount)
+            if not order:
+                raise Exception(f"Error selling {amount} of {s}")
+        else:
+            # Place normal order
+            order = place_order(obj, orderObj, s, action, amount)
+        if order:
+            printAndDiscord(
+                f"{key}: {action} {amount} of {s} in {print_account}: Success",
+                loop,
+            )
+    except Exception as e:
+        printAndDiscord(f"{key} {print_account}: Error placing order: {e}", loop)
+        print(traceback.format_exc())
+
+
 def webull_transaction(wbo: Brokerage, orderObj: stockOrder, loop=None):
     print()
     print("==============================")
     print("Webull")
     print("==============================")
     print()
+    if orderObj.get_price() == "market":
+        orderObj.set_price("MKT")
     for s in orderObj.get_stocks():
         for key in wbo.get_account_numbers():
             printAndDiscord(
                 f"{key}: {orderObj.get_action()}ing {orderObj.get_amount()} of {s}",
                 loop,
             )
-            for account in wbo.get_account_numbers(key):
-                print_account = maskString(account)
-                obj: webull = wbo.get_logged_in_objects(key, "wb")
-                internal_account = wbo.get_logged_in_objects(key, account)
-                if not orderObj.get_dry():
-                    old_amount = orderObj.get_amount()
-                    original_action = orderObj.get_action()
-                    try:
-                        if orderObj.get_price() == "market":
-                            orderObj.set_price("MKT")
-                        # If buy stock price < $1 or $0.10,
-                        # buy 100/1000 shares and sell 100/1000 - amount
-                        quote = obj.get_quote(s)
-                        askList = quote.get("askList", [])
-                        bidList = quote.get("bidList", [])
-                        if askList == [] and bidList == []:
-                            printAndDiscord(
-                                f"{key}: {s} is not available for trading", loop
-                            )
-                            raise Exception(f"{s} is not available for trading")
-                        askPrice = float(askList[0]["price"]) if askList != [] else 0
-                        bidPrice = float(bidList[0]["price"]) if bidList != [] else 0
-                        should_dance = False
-                        # Dance if:
-                        # amount < 100 and price < $1
-                        # amount < 1000 and price < $0.10
-                        if (
-                            (askPrice < 1 or bidPrice < 1)
-                            and orderObj.get_amount() < 100
-                        ) or (
-                            (askPrice < 0.1 or bidPrice < 0.1)
-                            and orderObj.get_amount() < 1000
-                        ):
-                            should_dance = True
-                        if should_dance and orderObj.get_action() == "buy":
-                            # 100 shares if < $1, 1000 shares if < $0.10
-                            big_amount = (
-                                1000 if (askPrice < 0.1 or bidPrice < 0.1) else 100
-                            )
-                            print(
-                                f"Buying {big_amount} then selling {big_amount - orderObj.get_amount()} of {s}"
-                            )
-                            orderObj.set_amount(big_amount)
-                            buy_success = place_order(
-                                obj, internal_account, orderObj, s
-                            )
-                            if not buy_success:
-                                raise Exception(f"Error buying {big_amount} of {s}")
-                            orderObj.set_amount(big_amount - old_amount)
-                            orderObj.set_action("sell")
-                            sleep(1)
-                            order = place_order(obj, internal_account, orderObj, s)
-                            if not order:
-                                raise Exception(
-                                    f"Error selling {big_amount - old_amount} of {s}"
-                                )
-                        else:
-                            # Place normal order
-                            order = place_order(obj, internal_account, orderObj, s)
-                        if order:
-                            printAndDiscord(
-                                f"{key}: {orderObj.get_action()} {orderObj.get_amount()} of {s} in {print_account}: Success",
-                                loop,
-                            )
-                    except Exception as e:
-                        printAndDiscord(
-                            f"{key} {print_account}: Error placing order: {e}", loop
-                        )
-                        print(traceback.format_exc())
-                        continue
-                    finally:
-                        # Restore orderObj
-                        orderObj.set_amount(old_amount)
-                        orderObj.set_action(original_action)
-                else:
-                    printAndDiscord(
-                        f"{key} {print_account}: Running in DRY mode. Transaction would've been: {orderObj.get_action()} {orderObj.get_amount()} of {s}",
+            # Decide on the dance once for every account
+            big_amount = None
+            if not orderObj.get_dry():
+                try:
+                    big_amount = get_dance_amount(
+                        wbo.get_logged_in_objects(key, "wb"), s, orderObj.get_amount()
+                    )
+                except Exception as e:
+                    printAndDiscord(f"{key}: Error getting quote: {e}", loop)
+                    print(traceback.format_exc())
+                    continue
+            # Each account has its own client view, so place orders at once
+            with ThreadPoolExecutor() as executor:
+                for account in wbo.get_account_numbers(key):
+                    executor.submit(
+                        webull_account_transaction,
+                        wbo,
+                        key,
+                        account,
+                        orderObj,
+                        s,
+                        big_amount,
                         loop,
                     )